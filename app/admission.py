@@ -0,0 +1,239 @@
+"""Admission control: per-client rate limits and a bounded number of requests in flight.
+
+Every request outside /static/ and /metrics falls into a route class. Before the view runs:
+
+- The worker checks how many requests it already has in flight. Each class may only use a
+  share of ADMISSION_MAX_IN_FLIGHT, checkout the whole of it, so under overload images and
+  browsing are turned away first with 503 and bookings and orders last.
+- The client spends a token from its bucket for that class. An empty bucket answers 429.
+
+Both answers are immediate and carry Retry-After. The buckets live in a memory-mapped file
+under ADMISSION_DIR, so every gunicorn worker on the host draws from the same ones. The
+in-flight count is per worker, because each worker has its own capacity (its greenlets or
+threads), and a shared count would leak whenever a worker died mid-request.
+
+Clients are told apart by the address nginx appends to X-Forwarded-For, which is only read
+on requests that arrive from nginx (ADMISSION_PROXY_ADDRESSES).
+ADMISSION_CONTROL=off turns the whole layer off.
+"""
+import os
+import mmap
+import math
+import time
+import fcntl
+import struct
+import hashlib
+import logging
+import tempfile
+import threading
+
+from flask import g, jsonify, request
+
+import metrics
+from workers import per_process
+
+logger = logging.getLogger(__name__)
+
+ENABLED = os.getenv("ADMISSION_CONTROL", "on") != "off"
+ADMISSION_DIR = os.getenv("ADMISSION_DIR", os.path.join(tempfile.gettempdir(), "taipeidaytrip-admission"))
+MAX_IN_FLIGHT = int(os.getenv("ADMISSION_MAX_IN_FLIGHT", 64))
+# Proxies in front of the app that append to X-Forwarded-For (nginx, in the container)
+TRUSTED_PROXIES = int(os.getenv("ADMISSION_TRUSTED_PROXIES", 1))
+# Peer addresses the nearest of those proxies connects from; anyone else's X-Forwarded-For is ignored
+PROXY_ADDRESSES = frozenset(
+    address.strip() for address in os.getenv("ADMISSION_PROXY_ADDRESSES", "127.0.0.1,::1").split(",") if address.strip()
+)
+OVERLOAD_RETRY_AFTER = 1
+
+# Bucket table: open addressing over SLOTS entries of (key hash, tokens, last refill)
+SLOTS = int(os.getenv("ADMISSION_SLOTS", 8192))
+PROBES = 8
+SLOT = struct.Struct("<Qdd")
+
+EXEMPT_PREFIXES = ("/static/", "/metrics")
+
+# Matched in order, first prefix wins; anything else is a page
+ROUTE_CLASSES = (
+    ("/api/booking", "checkout"),
+    ("/api/order", "checkout"),
+    ("/api/user", "auth"),
+    ("/api/attractions", "browse"),
+    ("/api/attraction/", "browse"),
+    ("/api/mrts", "browse"),
+    ("/img/", "images"),
+    ("/api/", "api"),
+)
+
+
+def _limit(name, rate, burst, share):
+    """(tokens per second, bucket size, share of MAX_IN_FLIGHT); ADMISSION_LIMIT_<NAME>="rate,burst" overrides."""
+    value = os.getenv(f"ADMISSION_LIMIT_{name.upper()}")
+    if value:
+        rate, burst = (float(part) for part in value.split(","))
+    return rate, burst, share
+
+
+LIMITS = {
+    "checkout": _limit("checkout", 1, 10, 1.0),
+    "auth": _limit("auth", 2, 20, 0.9),
+    "pages": _limit("pages", 5, 30, 0.75),
+    "api": _limit("api", 5, 20, 0.75),
+    "browse": _limit("browse", 10, 50, 0.75),
+    "images": _limit("images", 50, 200, 0.5),
+}
+
+
+def route_class(path):
+    """The route class for a request path, or None when it is not limited."""
+    if path.startswith(EXEMPT_PREFIXES):
+        return None
+    for prefix, name in ROUTE_CLASSES:
+        if path.startswith(prefix):
+            return name
+    return "pages"
+
+
+def client_address():
+    """The client's address: the entry the nearest trusted proxy added to X-Forwarded-For.
+
+    A request that did not come through one of our proxies is known by its own peer address,
+    whatever X-Forwarded-For it carries.
+    """
+    forwarded = request.headers.get("X-Forwarded-For")
+    if forwarded and TRUSTED_PROXIES > 0 and request.remote_addr in PROXY_ADDRESSES:
+        hops = [hop.strip() for hop in forwarded.split(",") if hop.strip()]
+        if hops:
+            # Entries left of what our proxies appended were written by the client and prove nothing
+            return hops[max(len(hops) - TRUSTED_PROXIES, 0)]
+    return request.remote_addr or "unknown"
+
+
+class SharedBuckets:
+    """Token buckets in a memory-mapped file, shared by every process that opens it.
+
+    A bucket is found by hashing its key into the table and probing a few neighbouring
+    slots. When those are all taken, the least recently used one is reused; a bucket idle
+    long enough to have refilled behaves the same as a new one anyway. Updates hold an
+    flock on the file (across processes) and a lock (across this process's threads).
+    """
+
+    def __init__(self, path, slots=SLOTS):
+        self.slots = slots
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        size = slots * SLOT.size
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            # Zeroed slots are empty, so a new or grown file needs no other setup
+            if os.fstat(self._fd).st_size < size:
+                os.ftruncate(self._fd, size)
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        self._map = mmap.mmap(self._fd, size)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key_hash(key):
+        # 0 marks an empty slot
+        return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "little") or 1
+
+    def take(self, key, rate, burst, now=None):
+        """Spend one token from key's bucket; returns 0 if there was one, else seconds until there is."""
+        now = time.time() if now is None else now
+        key_hash = self.key_hash(key)
+        start = key_hash % self.slots
+        with self._lock:
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                offset, tokens, updated = self._find(key_hash, start, now)
+                tokens = min(burst, tokens + max(now - updated, 0.0) * rate)
+                wait = 0.0
+                if tokens >= 1:
+                    tokens -= 1
+                else:
+                    wait = (1 - tokens) / rate
+                SLOT.pack_into(self._map, offset, key_hash, tokens, now)
+                return wait
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def _find(self, key_hash, start, now):
+        """(offset, tokens, last refill) of key_hash's slot, claiming a free or stale one for a new bucket."""
+        oldest = None
+        for probe in range(PROBES):
+            offset = ((start + probe) % self.slots) * SLOT.size
+            slot_hash, tokens, updated = SLOT.unpack_from(self._map, offset)
+            if slot_hash == key_hash:
+                return offset, tokens, updated
+            if slot_hash == 0:
+                return offset, math.inf, now
+            if oldest is None or updated < oldest[1]:
+                oldest = (offset, updated)
+        return oldest[0], math.inf, now
+
+    def close(self):
+        self._map.close()
+        os.close(self._fd)
+
+
+@per_process
+def get_buckets():
+    return SharedBuckets(os.path.join(ADMISSION_DIR, "buckets"))
+
+
+_in_flight = 0
+_in_flight_lock = threading.Lock()
+
+
+def in_flight():
+    return _in_flight
+
+
+def _reject(name, reason, status, message, retry_after):
+    metrics.registry.inc("admission_rejected_total", (("class", name), ("reason", reason)))
+    response = jsonify({"error": True, "message": message})
+    response.status_code = status
+    response.headers["Retry-After"] = str(max(1, math.ceil(retry_after)))
+    return response
+
+
+def _admit():
+    global _in_flight
+    name = route_class(request.path)
+    if name is None:
+        return None
+    rate, burst, share = LIMITS[name]
+
+    with _in_flight_lock:
+        if _in_flight >= MAX_IN_FLIGHT * share:
+            overloaded = True
+        else:
+            overloaded = False
+            _in_flight += 1
+    if overloaded:
+        return _reject(name, "overloaded", 503, "Server busy, please retry", OVERLOAD_RETRY_AFTER)
+    g.admitted = True
+
+    try:
+        wait = get_buckets().take(f"{name}:{client_address()}", rate, burst)
+    except OSError as e:
+        # Losing the shared table should not take the site down with it
+        logger.error(f"Rate limiter unavailable: {e}")
+        wait = 0.0
+    if wait > 0:
+        return _reject(name, "rate_limited", 429, "Too many requests", wait)
+    return None
+
+
+def _release(exc=None):
+    global _in_flight
+    if g.pop("admitted", False):
+        with _in_flight_lock:
+            _in_flight -= 1
+
+
+def init_app(app):
+    if not ENABLED:
+        return
+    app.before_request(_admit)
+    app.teardown_request(_release)
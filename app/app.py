@@ -1,117 +1,243 @@
-from flask import Flask, jsonify, request, render_template
+from flask import Flask, jsonify, request, render_template, Response
 import os
 import pymysql
 import logging
 import json
+import base64
 from collections import OrderedDict
-import jwt
 import datetime
-from datetime import datetime as dt_datetime
-import requests
 from dotenv import load_dotenv
+from database import get_db_connection, get_pool, is_duplicate_key, init_app as init_database
+from catalogue import catalogue, get_catalogue
+from http_cache import cacheable, template_mtime, newest
+from serialization import script_json
+from auth import login_required, admin_required, encode_token
+from payments import submit_payment, start_reconciler
+from order_ids import next_order_number
+from queries import fetch_booking, fetch_order
+import metrics
+import compression
+import assets
+import images
+import admission
 
 # Set up logs
 gunicorn_logger = logging.getLogger('gunicorn.error')
 logging.basicConfig(level=logging.INFO, handlers=gunicorn_logger.handlers)
 logger = logging.getLogger(__name__)
 
+load_dotenv()
+
 app = Flask(__name__)
 app.config["JSON_AS_ASCII"] = False
-app.config["TEMPLATES_AUTO_RELOAD"] = True
-app.debug = True
 
-load_dotenv()
+# APP_ENV=development turns on the debugger and template auto-reload; anything else runs as production
+DEVELOPMENT = os.getenv("APP_ENV", "production") == "development"
+app.config["TEMPLATES_AUTO_RELOAD"] = DEVELOPMENT
+app.debug = DEVELOPMENT
 
-# Unified database connection function
-def get_db_connection():
-    try:
-        logger.info("Attempting to connect to database...")
-        con = pymysql.connect(
-            host=os.getenv("host"),
-            port=int(os.getenv("port")),
-            user=os.getenv("user"),
-            password=os.getenv("password"),
-            database=os.getenv("database"),
-            connect_timeout=60,  # Connection timeout 60 seconds
-            read_timeout=60,     # Read timeout 60 seconds
-            write_timeout=60     # Write timeout 60 seconds
-        )
-        logger.info("Database connection successful")
-        return con
-    except pymysql.MySQLError as e:
-        logger.error(f"Database connection failed: {e}")
-        raise
+app.config["CACHE_CONTROL_API"] = os.getenv("CACHE_CONTROL_API", "public, max-age=60")
+app.config["CACHE_CONTROL_MRTS"] = os.getenv("CACHE_CONTROL_MRTS", "public, max-age=300")
+app.config["CACHE_CONTROL_PAGES"] = os.getenv("CACHE_CONTROL_PAGES", "no-cache")
+
+init_database(app)
+metrics.init_app(app)
+# After metrics, so turned-away requests are still counted with their 429 or 503
+admission.init_app(app)
+assets.init_app(app)
+
+def pool_gauges():
+    stats = get_pool().stats()
+    return {
+        "db_pool_in_use": stats["in_use"],
+        "db_pool_idle": stats["idle"],
+        "db_pool_waiting": stats["waiting"],
+        "db_pool_connections_created": stats["created"],
+    }
+
+metrics.register_gauges(pool_gauges)
+
+# Registered after metrics so the compression time still counts towards the request total
+compression.init_app(app)
+
+def compression_gauges():
+    stats = compression.variants.stats()
+    return {
+        "compression_cache_bytes": stats["bytes"],
+        "compression_cache_hits": stats["hits"],
+        "compression_cache_misses": stats["misses"],
+    }
+
+metrics.register_gauges(compression_gauges)
+
+def admission_gauges():
+    return {"admission_in_flight": admission.in_flight()}
+
+metrics.register_gauges(admission_gauges)
+
+# Settles orders whose payment job was lost with its worker
+start_reconciler()
+
+def catalogue_loaded_at():
+    return get_catalogue().loaded_at
 
 # Pages
+# The first page, MRT list and attraction record are inlined as JSON, so the first paint
+# needs no API round trip; without a catalogue the scripts fetch them as before
 @app.route("/")
+@cacheable("CACHE_CONTROL_PAGES", last_modified=newest(template_mtime(app, "index.html"), catalogue_loaded_at))
 def index():
-    return render_template("index.html")
+    initial_data = None
+    try:
+        catalogue = get_catalogue()
+        initial_data = script_json({
+            "attractions": attractions_page(catalogue, None, 0),
+            "mrts": {"data": catalogue.mrt_ranking},
+        })
+    except Exception as e:
+        logger.error(f"Could not inline initial data: {e}")
+    return render_template("index.html", initial_data=initial_data)
 
 @app.route("/attraction/<id>")
+@cacheable("CACHE_CONTROL_PAGES", last_modified=newest(template_mtime(app, "attraction.html"), catalogue_loaded_at))
 def attraction(id):
-    return render_template("attraction.html")
+    initial_data = None
+    if id.isdigit():
+        try:
+            fragment = get_catalogue().fragments.get(int(id))
+            # Same body /api/attraction/<id> answers with
+            initial_data = script_json({"data": fragment} if fragment else {"error": True, "message": "Attraction ID does not exist"})
+        except Exception as e:
+            logger.error(f"Could not inline initial data: {e}")
+    return render_template("attraction.html", initial_data=initial_data)
 
 @app.route("/booking")
+@cacheable("CACHE_CONTROL_PAGES", last_modified=template_mtime(app, "booking.html"))
 def booking():
     return render_template("booking.html")
 
 @app.route("/thankyou")
+@cacheable("CACHE_CONTROL_PAGES", last_modified=template_mtime(app, "thankyou.html"))
 def thankyou():
     return render_template("thankyou.html")
 
 # API Routes
+PAGE_SIZE = 12
+
+UPSERT_BOOKING = (
+    "INSERT INTO booking (memberID, attractionID, date, time, price) VALUES (%s, %s, %s, %s, %s) "
+    "ON DUPLICATE KEY UPDATE attractionID = VALUES(attractionID), date = VALUES(date), "
+    "time = VALUES(time), price = VALUES(price)"
+)
+ORDER_TRIP_KEY = "uq_ordersystem_active_trip"
+NEARBY_MAX_LIMIT = 50
+NEARBY_MAX_RADIUS = 50000  # metres
+BATCH_MAX_IDS = 50
+
+def encode_cursor(attraction_id):
+    return base64.urlsafe_b64encode(json.dumps({"id": attraction_id}).encode()).decode().rstrip("=")
+
+def decode_cursor(cursor):
+    padded = cursor + "=" * (-len(cursor) % 4)
+    return int(json.loads(base64.urlsafe_b64decode(padded))["id"])
+
+def attractions_page(catalogue, keyword, start, page=None):
+    """/api/attractions's body for the matches from `start`: cursor form, or page form when `page` is given."""
+    # One extra row tells us whether another page exists without counting anything
+    window = catalogue.matches(keyword)[start:start + PAGE_SIZE + 1]
+    data = window[:PAGE_SIZE]
+    has_more = len(window) > PAGE_SIZE
+
+    response_data = OrderedDict()
+    response_data["data"] = [catalogue.fragments[attraction["id"]] for attraction in data] if len(data) > 0 else None
+    if page is None:
+        response_data["nextCursor"] = encode_cursor(data[-1]["id"]) if has_more else None
+    else:
+        response_data["nextPage"] = page + 1 if has_more else None
+    return response_data
+
 @app.route("/api/attractions")
+@cacheable("CACHE_CONTROL_API", last_modified=catalogue_loaded_at)
 def attractions():
     try:
-        con = get_db_connection()
-        cursor = con.cursor()
-
-        attraction_list = []
+        catalogue = get_catalogue()
         keyword = request.args.get('keyword')
-        page = int(request.args.get('page', 0))
-        
-        if keyword:
-            query = "SELECT * FROM attractions WHERE (name LIKE %s) OR (mrt = %s)"
-            attraction_list.extend(['%' + keyword + '%', keyword])
+        cursor = request.args.get('cursor')
+        if cursor is not None:
+            start = 0
+            if cursor:
+                try:
+                    start = catalogue.start_after(keyword, decode_cursor(cursor))
+                except (ValueError, KeyError, TypeError):
+                    start = None
+                if start is None:
+                    return jsonify({"error": True, "message": "Invalid cursor"}), 400
         else:
-            query = "SELECT * FROM attractions"
+            page = max(int(request.args.get('page', 0)), 0)
+            start = page * PAGE_SIZE
 
-        query += " ORDER BY id LIMIT %s, 12"
-        attraction_list.append(page * 12)
+        return jsonify(attractions_page(catalogue, keyword, start, page=None if cursor is not None else page))
 
-        cursor.execute(query, attraction_list)
-        data = cursor.fetchall()
-
-        next_page_query = "SELECT COUNT(*) FROM attractions LIMIT %s, 12"
-        cursor.execute(next_page_query, [page * 12])
-        next_page_data = cursor.fetchall()
-        total_results = next_page_data[0][0] if next_page_data else 0
+    except pymysql.MySQLError as e:
+        logger.error(f"Database error: {e}")
+        return jsonify({"error": True, "message": f"Database error: {str(e)}"}), 500
+    except Exception as e:
+        logger.error(f"Server error: {e}")
+        return jsonify({"error": True, "message": "Internal server error"}), 500
 
+@app.route("/api/attractions/nearby")
+@cacheable("CACHE_CONTROL_API", last_modified=catalogue_loaded_at)
+def nearby_attractions():
+    try:
+        catalogue = get_catalogue()
+        try:
+            limit = min(int(request.args.get("limit", PAGE_SIZE)), NEARBY_MAX_LIMIT)
+            radius = request.args.get("radius")
+            radius = min(float(radius), NEARBY_MAX_RADIUS) if radius is not None else None
+            if "id" in request.args:
+                attraction_id = int(request.args["id"])
+                origin = catalogue.by_id.get(attraction_id)
+                if origin is None or origin["lat"] is None or origin["lng"] is None:
+                    return jsonify({"error": True, "message": "Attraction ID does not exist"}), 400
+                lat, lng = float(origin["lat"]), float(origin["lng"])
+            else:
+                attraction_id = None
+                lat, lng = float(request.args["lat"]), float(request.args["lng"])
+        except (KeyError, ValueError):
+            return jsonify({"error": True, "message": "Give lat and lng, or id, as numbers"}), 400
+        if not (-90 <= lat <= 90 and -180 <= lng <= 180) or limit < 1 or (radius is not None and radius < 0):
+            return jsonify({"error": True, "message": "Coordinates, radius or limit out of range"}), 400
+
+        nearest = catalogue.geo_index.nearest(lat, lng, limit, radius=radius, exclude=attraction_id)
         response_data = OrderedDict()
-        response_data["nextPage"] = page + 1 if len(data) >= 12 else None
-        response_data["data"] = [] if len(data) > 0 else None
-
-        for row in data:
-            attraction = OrderedDict()
-            attraction["id"] = row[0]
-            attraction["name"] = row[2]
-            attraction["category"] = row[3]
-            attraction["description"] = row[4]
-            attraction["address"] = row[5]
-            attraction["transport"] = row[6]
-            attraction["mrt"] = row[7]
-            attraction["lat"] = row[8]
-            attraction["lng"] = row[9]
-            attraction["images"] = []
-
-            img_query = "SELECT imageUrl FROM attractionImages WHERE attractionRownumber = %s"
-            cursor.execute(img_query, (row[1],))
-            img_data = cursor.fetchall()
-            attraction["images"] = [img[0] for img in img_data]
-
-            response_data["data"].append(attraction)
+        response_data["data"] = [catalogue.fragments[attraction["id"]] for _, attraction in nearest]
+        response_data["distances"] = [round(distance) for distance, _ in nearest]
+        return jsonify(response_data)
 
-        con.close()
+    except pymysql.MySQLError as e:
+        logger.error(f"Database error: {e}")
+        return jsonify({"error": True, "message": f"Database error: {str(e)}"}), 500
+    except Exception as e:
+        logger.error(f"Server error: {e}")
+        return jsonify({"error": True, "message": "Internal server error"}), 500
+
+@app.route("/api/attractions/batch")
+@cacheable("CACHE_CONTROL_API", last_modified=catalogue_loaded_at)
+def attractions_batch():
+    try:
+        try:
+            ids = [int(value) for value in request.args.get("ids", "").split(",")]
+        except ValueError:
+            return jsonify({"error": True, "message": "ids must be a comma-separated list of attraction IDs"}), 400
+        if len(ids) > BATCH_MAX_IDS:
+            return jsonify({"error": True, "message": f"At most {BATCH_MAX_IDS} ids per request"}), 400
+
+        # Same pre-encoded objects as /api/attraction/<id>; unknown ids stay in place as null
+        fragments = get_catalogue().fragments
+        data = [fragments.get(attraction_id) for attraction_id in ids]
+        response_data = OrderedDict()
+        response_data["data"] = data
+        response_data["missing"] = [attraction_id for attraction_id, attraction in zip(ids, data) if attraction is None]
         return jsonify(response_data)
 
     except pymysql.MySQLError as e:
@@ -122,39 +248,38 @@ def attractions():
         return jsonify({"error": True, "message": "Internal server error"}), 500
 
 @app.route("/api/attraction/<int:attractionId>")
+@cacheable("CACHE_CONTROL_API", last_modified=catalogue_loaded_at)
 def get_attraction(attractionId):
     try:
-        con = get_db_connection()
-        cursor = con.cursor()
-
-        query = "SELECT * FROM attractions WHERE id = %s"
-        cursor.execute(query, (attractionId,))
-        data = cursor.fetchall()
-
-        if not data:
+        attraction = get_catalogue().fragments.get(attractionId)
+        if not attraction:
             return jsonify({"error": True, "message": "Attraction ID does not exist"}), 400
 
-        attraction = {
-            "id": data[0][0],
-            "name": data[0][2],
-            "category": data[0][3],
-            "description": data[0][4],
-            "address": data[0][5],
-            "transport": data[0][6],
-            "mrt": data[0][7],
-            "lat": data[0][8],
-            "lng": data[0][9],
-            "images": []
-        }
+        return jsonify({"data": attraction})
+
+    except pymysql.MySQLError as e:
+        logger.error(f"Database error: {e}")
+        return jsonify({"error": True, "message": f"Database error: {str(e)}"}), 500
+    except Exception as e:
+        logger.error(f"Server error: {e}")
+        return jsonify({"error": True, "message": "Internal server error"}), 500
 
-        img_query = "SELECT imageUrl FROM attractionImages WHERE attractionRownumber = %s"
-        cursor.execute(img_query, (data[0][1],))
-        img_data = cursor.fetchall()
-        attraction["images"] = [img[0] for img in img_data]
+@app.route("/img/<int:attractionId>/<int:index>")
+def attraction_image(attractionId, index):
+    try:
+        attraction = get_catalogue().by_id.get(attractionId)
+        if attraction is None or index >= len(attraction["images"]):
+            return jsonify({"error": True, "message": "Image does not exist"}), 404
+        try:
+            width = images.snap_width(request.args.get("w"))
+        except ValueError:
+            return jsonify({"error": True, "message": "w must be a positive number of pixels"}), 400
 
-        con.close()
-        return jsonify({"data": attraction})
+        return images.serve(attraction["images"][index], width)
 
+    except images.OriginError as e:
+        logger.error(f"Image origin error: {e}")
+        return jsonify({"error": True, "message": "Image is not available"}), 502
     except pymysql.MySQLError as e:
         logger.error(f"Database error: {e}")
         return jsonify({"error": True, "message": f"Database error: {str(e)}"}), 500
@@ -163,19 +288,36 @@ def get_attraction(attractionId):
         return jsonify({"error": True, "message": "Internal server error"}), 500
 
 @app.route("/api/mrts")
+@cacheable("CACHE_CONTROL_MRTS", last_modified=catalogue_loaded_at)
 def mrts():
     try:
-        con = get_db_connection()
-        cursor = con.cursor()
-        mrts_list = []
+        catalogue = get_catalogue()
+        response_data = {"data": catalogue.mrt_ranking}
+        etag = catalogue.mrt_etag
+        # Opt-in: attraction count per station, aligned with data
+        if request.args.get("counts") in ("1", "true"):
+            response_data["counts"] = catalogue.mrt_counts
+            etag += "-counts"
+
+        # The ranking already carries a content hash, so skip hashing the body again
+        response = jsonify(response_data)
+        response.set_etag(etag)
+        return response
 
-        query = "SELECT DISTINCT mrt FROM attractions ORDER BY (SELECT COUNT(*) FROM attractions AS a WHERE a.mrt = attractions.mrt) DESC"
-        cursor.execute(query)
-        mrt_results = cursor.fetchall()
+    except pymysql.MySQLError as e:
+        logger.error(f"Database error: {e}")
+        return jsonify({"error": True, "message": f"Database error: {str(e)}"}), 500
+    except Exception as e:
+        logger.error(f"Server error: {e}")
+        return jsonify({"error": True, "message": "Internal server error"}), 500
 
-        mrts_list = [mrt[0] for mrt in mrt_results]
-        con.close()
-        return jsonify({"data": mrts_list})
+@app.route("/api/admin/catalogue/reload", methods=["POST"])
+@admin_required
+def reload_catalogue():
+    try:
+        catalogue.invalidate()
+        snapshot = get_catalogue()
+        return jsonify({"ok": True, "attractions": len(snapshot.attractions)})
 
     except pymysql.MySQLError as e:
         logger.error(f"Database error: {e}")
@@ -234,8 +376,7 @@ def signin():
             "email": signinMembership[0][2]
         }
         expiration_time = datetime.datetime.utcnow() + datetime.timedelta(days=7)
-        secret_key = "My_secret_key"
-        token = jwt.encode({"data": user_info}, secret_key, algorithm="HS256")
+        token = encode_token(user_info, expiration_time)
 
         con.close()
         return jsonify({"token": token})
@@ -247,110 +388,41 @@ def signin():
         logger.error(f"Server error: {e}")
         return jsonify({"error": True, "message": "Internal server error"}), 500
 
-def authenticate_token(f):
-    def decorated(*args, **kwargs):
-        token = request.headers.get("Authorization")
-        secret_key = "My_secret_key"
-        if not token:
-            return jsonify({"data": None})
-
-        token_parts = token.split()
-        if len(token_parts) != 2 or token_parts[0].lower() != "bearer":
-            return jsonify({"data": None})
-
-        jwt_token = token_parts[1]
-        try:
-            decode_token = jwt.decode(jwt_token, secret_key, algorithms=["HS256"])
-            token_user_info = decode_token.get("data", None)
-            if not token_user_info:
-                return jsonify({"data": None})
-            return f(token_user_info, *args, **kwargs)
-        except jwt.ExpiredSignatureError:
-            logger.error("JWT Token has expired")
-            return jsonify({"data": None}), 400
-        except jwt.InvalidTokenError as e:
-            logger.error(f"JWT Token is invalid: {str(e)}")
-            return jsonify({"data": None}), 400
-    return decorated
-
 @app.route("/api/user/auth", methods=["GET"])
-@authenticate_token
+@login_required(silent=True)
 def user_auth(current_user):
     return jsonify({"data": current_user})
 
 @app.route("/api/booking", methods=["GET"])
-def get_trip():
+@login_required(silent=True)
+def get_trip(current_user):
     try:
         con = get_db_connection()
         cursor = con.cursor()
-        token = request.headers.get("Authorization")
-        secret_key = "My_secret_key"
-
-        if not token:
-            con.close()
-            return jsonify({"data": None})
-
-        token_parts = token.split()
-        if len(token_parts) != 2 or token_parts[0].lower() != "bearer":
-            con.close()
-            return jsonify({"data": None})
-
-        jwt_token = token_parts[1]
-        decoded = jwt.decode(jwt_token, secret_key, algorithms=["HS256"])
-        user_id = decoded["data"]["id"]
-
-        cursor.execute('SELECT id FROM membership WHERE id = %s', (user_id,))
-        member_id = cursor.fetchone()
-        if not member_id:
-            con.close()
-            return jsonify({"data": None})
-        member_id = member_id[0]
-
-        cursor.execute('SELECT memberID, attractionID, date, time, price FROM booking WHERE memberID = %s', (member_id,))
-        booking_info = cursor.fetchone()
+        member_id = current_user["id"]
 
-        if not booking_info:
+        booking = fetch_booking(cursor, member_id)
+        if not booking:
             con.close()
             return jsonify({"data": None})
 
-        member_id, attraction_id, booking_info_date, booking_info_time, booking_info_price = booking_info
-
-        cursor.execute('SELECT id, rownumber, name, address FROM attractions WHERE id = %s', (attraction_id,))
-        attraction_info = cursor.fetchone()
-        if not attraction_info:
-            con.close()
-            return jsonify({"data": None})
-
-        attraction_id, attraction_rownumber, attraction_name, attraction_address = attraction_info
-
-        img_query = "SELECT imageUrl FROM attractionImages WHERE attractionRownumber = %s"
-        cursor.execute(img_query, (attraction_rownumber,))
-        img_data = cursor.fetchall()
-        image_url = img_data[0][0] if img_data else ""
-
         attraction = {
-            "id": attraction_id,
-            "name": attraction_name,
-            "address": attraction_address,
-            "images": image_url
+            "id": booking["attraction_id"],
+            "name": booking["attraction_name"],
+            "address": booking["attraction_address"],
+            "images": booking["attraction_image"] or ""
         }
 
         booking_response_data = {
             "attraction": attraction,
-            "date": booking_info_date,
-            "time": booking_info_time,
-            "price": booking_info_price,
+            "date": booking["date"],
+            "time": booking["time"],
+            "price": booking["price"],
         }
 
         con.close()
         return jsonify({"data": booking_response_data})
 
-    except jwt.ExpiredSignatureError:
-        logger.error("Token has expired")
-        return jsonify({"error": "Token expired"}), 400
-    except jwt.DecodeError:
-        logger.error("Token decoding failed")
-        return jsonify({"error": "Token decoding failed"}), 400
     except pymysql.MySQLError as e:
         logger.error(f"Database error: {e}")
         return jsonify({"error": True, "message": f"Database error: {str(e)}"}), 500
@@ -359,25 +431,12 @@ def get_trip():
         return jsonify({"error": True, "message": "Internal server error"}), 500
 
 @app.route("/api/booking", methods=["POST"])
-def update_trip():
+@login_required()
+def update_trip(current_user):
     try:
         con = get_db_connection()
         cursor = con.cursor()
-        token = request.headers.get("Authorization")
-        secret_key = "My_secret_key"
-
-        if not token:
-            con.close()
-            return jsonify({"error": True, "message": "Not logged in, access denied"}), 403
-
-        token_parts = token.split()
-        if len(token_parts) != 2 or token_parts[0].lower() != "bearer":
-            con.close()
-            return jsonify({"error": True, "message": "Invalid Token"}), 403
-
-        jwt_token = token_parts[1]
-        decoded = jwt.decode(jwt_token, secret_key, algorithms=["HS256"])
-        user_id = decoded["data"]["id"]
+        member_id = current_user["id"]
 
         trip_reservation = request.get_json()
         attractionId = trip_reservation["attractionId"]
@@ -385,29 +444,13 @@ def update_trip():
         time = trip_reservation["time"]
         price = trip_reservation["price"]
 
-        cursor.execute('SELECT id FROM membership WHERE id = %s', (user_id,))
-        member_id = cursor.fetchone()[0]
-
-        cursor.execute('SELECT memberID FROM booking WHERE memberID = %s', (member_id,))
-        existing_booking = cursor.fetchone()
-
-        if existing_booking:
-            update_booking = "UPDATE booking SET attractionID = %s, date = %s, time = %s, price = %s WHERE memberID = %s"
-            cursor.execute(update_booking, (attractionId, date, time, price, member_id))
-        else:
-            insert_booking = "INSERT INTO booking (memberID, attractionID, date, time, price) VALUES (%s, %s, %s, %s, %s)"
-            cursor.execute(insert_booking, (member_id, attractionId, date, time, price))
+        # One booking per member (unique key on memberID): replace it or create it in one statement
+        cursor.execute(UPSERT_BOOKING, (member_id, attractionId, date, time, price))
 
         con.commit()
         con.close()
         return jsonify({"ok": True})
 
-    except jwt.ExpiredSignatureError:
-        logger.error("Token has expired")
-        return jsonify({"error": True, "message": "Token has expired"}), 400
-    except jwt.InvalidTokenError as e:
-        logger.error(f"Token is invalid: {str(e)}")
-        return jsonify({"error": True, "message": f"Token is invalid: {str(e)}"}), 400
     except pymysql.MySQLError as e:
         logger.error(f"Database error: {e}")
         return jsonify({"error": True, "message": f"Database error: {str(e)}"}), 500
@@ -416,43 +459,19 @@ def update_trip():
         return jsonify({"error": True, "message": "Internal server error"}), 500
 
 @app.route("/api/booking", methods=["DELETE"])
-def delete_trip():
+@login_required()
+def delete_trip(current_user):
     try:
         con = get_db_connection()
         cursor = con.cursor()
-        token = request.headers.get("Authorization")
-        secret_key = "My_secret_key"
+        member_id = current_user["id"]
 
-        if not token:
-            con.close()
-            return jsonify({"error": True, "message": "Not logged in, access denied"}), 403
-
-        token_parts = token.split()
-        if len(token_parts) != 2 or token_parts[0].lower() != "bearer":
-            con.close()
-            return jsonify({"error": True, "message": "Invalid Token"}), 403
-
-        jwt_token = token_parts[1]
-        decoded = jwt.decode(jwt_token, secret_key, algorithms=["HS256"])
-        user_id = decoded["data"]["id"]
-
-        cursor.execute('SELECT id FROM membership WHERE id = %s', (user_id,))
-        member_id = cursor.fetchone()[0]
-
-        cursor.execute('SELECT memberID FROM booking WHERE memberID = %s', (member_id,))
-        if cursor.fetchone():
-            cursor.execute("DELETE FROM booking WHERE memberID = %s", (member_id,))
+        if cursor.execute("DELETE FROM booking WHERE memberID = %s", (member_id,)):
             con.commit()
 
         con.close()
         return jsonify({"ok": True})
 
-    except jwt.ExpiredSignatureError:
-        logger.error("Token has expired")
-        return jsonify({"error": True, "message": "Token expired"}), 400
-    except jwt.DecodeError:
-        logger.error("Token decoding failed")
-        return jsonify({"error": True, "message": "Token decoding failed"}), 400
     except pymysql.MySQLError as e:
         logger.error(f"Database error: {e}")
         return jsonify({"error": True, "message": f"Database error: {str(e)}"}), 500
@@ -461,26 +480,13 @@ def delete_trip():
         return jsonify({"error": True, "message": "Internal server error"}), 500
 
 @app.route("/api/order", methods=["POST"])
-def order_trip():
+@login_required()
+def order_trip(current_user):
     try:
         con = get_db_connection()
         cursor = con.cursor()
-        token = request.headers.get("Authorization")
-        secret_key = "My_secret_key"
-
-        if not token:
-            con.close()
-            return jsonify({"error": True, "message": "Not logged in, access denied"}), 403
-
-        token_parts = token.split()
-        if len(token_parts) != 2 or token_parts[0].lower() != "bearer":
-            con.close()
-            return jsonify({"error": True, "message": "Invalid Token"}), 403
-
-        jwt_token = token_parts[1]
-        decoded = jwt.decode(jwt_token, secret_key, algorithms=["HS256"])
         data = request.get_json()
-        user_id = decoded["data"]["id"]
+        user_id = current_user["id"]
 
         prime = data['prime']
         price = data['order']['price'][0]
@@ -490,58 +496,31 @@ def order_trip():
         contact_name = data['order']['contact']['name']
         contact_email = data['order']['contact']['email']
         contact_phone = data['order']['contact']['phone']
-        current_time = dt_datetime.now().strftime('%Y%m%d%H%M%S')
-        order_num = current_time
+        order_num = next_order_number()
 
-        cursor.execute('SELECT * FROM ordersystem WHERE name = %s AND date = %s AND time = %s AND attractionId = %s',
-                       (contact_name, trip_date, trip_time, trip_attraction_id))
-        if cursor.fetchone():
+        # The unique key on (name, date, time, attractionId, tripActive) atomically rejects an
+        # identical order, unless that one's payment failed and released the trip
+        try:
+            cursor.execute('INSERT INTO ordersystem (orderNum, memberId, attractionId, date, time, price, email, name, phone, status) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)',
+                           (order_num, user_id, trip_attraction_id, trip_date, trip_time, price, contact_email, contact_name, contact_phone, 'Pending'))
+        except pymysql.err.IntegrityError as e:
+            if not is_duplicate_key(e, ORDER_TRIP_KEY):
+                raise
             con.close()
             return jsonify({"error": True, "message": "Order creation failed, identical order already exists"}), 400
 
-        cursor.execute('INSERT INTO ordersystem (orderNum, memberId, attractionId, date, time, price, email, name, phone, status) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)',
-                       (order_num, user_id, trip_attraction_id, trip_date, trip_time, price, contact_email, contact_name, contact_phone, 'Pending'))
-
-        order_data = {
-            "prime": prime,
-            "partner_key": 'partner_b0OKh6UYc94AT4ThSiORUeEoiBJBNIsMofJjaVZlzN2N9nmP7vwLvQ8q',
-            "merchant_id": 'j22868706_TAISHIN',
-            "details": "TaiPei Day Trip Booking",
-            "amount": price,
-            "cardholder": {
-                "phone_number": contact_phone,
-                "name": contact_name,
-                "email": contact_email,
-            },
-        }
-        headers = {
-            "Content-Type": "application/json",
-            "x-api-key": 'partner_b0OKh6UYc94AT4ThSiORUeEoiBJBNIsMofJjaVZlzN2N9nmP7vwLvQ8q',
-        }
-        url = "https://sandbox.tappaysdk.com/tpc/payment/pay-by-prime"
-        req = requests.post(url, headers=headers, json=order_data, timeout=30)
-        status_code = req.json().get("status")
+        con.commit()
+        con.close()
+
+        # The gateway call can take many seconds; run it off the request worker and let the client poll
+        submit_payment(order_num, prime, price, contact_name, contact_email, contact_phone)
+        return jsonify({
+            "data": {
+                "number": order_num,
+                "payment": {"status": None, "message": "Payment pending"},
+            }
+        }), 202
 
-        if status_code == 0:
-            cursor.execute('UPDATE ordersystem SET status = %s WHERE orderNum = %s', ('confirm', order_num))
-            con.commit()
-            con.close()
-            return jsonify({
-                "data": {
-                    "number": order_num,
-                    "payment": {"status": status_code, "message": "Payment successful"},
-                }
-            }), 200
-        else:
-            con.close()
-            return jsonify({"error": True, "message": req.json().get("msg")}), 400
-
-    except jwt.ExpiredSignatureError:
-        logger.error("Token has expired")
-        return jsonify({"error": True, "message": "Token expired"}), 400
-    except jwt.DecodeError:
-        logger.error("Token decoding failed")
-        return jsonify({"error": True, "message": "Token decoding failed"}), 400
     except pymysql.MySQLError as e:
         logger.error(f"Database error: {e}")
         return jsonify({"error": True, "message": f"Database error: {str(e)}"}), 500
@@ -550,78 +529,45 @@ def order_trip():
         return jsonify({"error": True, "message": "Internal server error"}), 500
 
 @app.route("/api/order/<int:orderNumber>", methods=["GET"])
-def show_trip(orderNumber):
+@login_required()
+def show_trip(current_user, orderNumber):
     try:
         con = get_db_connection()
         cursor = con.cursor()
-        token = request.headers.get("Authorization")
-        secret_key = "My_secret_key"
-
-        if not token:
-            con.close()
-            return jsonify({"error": True, "message": "No valid token provided"}), 403
 
-        token_parts = token.split()
-        if len(token_parts) != 2 or token_parts[0].lower() != "bearer":
-            con.close()
-            return jsonify({"error": True, "message": "Invalid Token"}), 403
-
-        jwt_token = token_parts[1]
-        decoded = jwt.decode(jwt_token, secret_key, algorithms=["HS256"])
-
-        query = "SELECT * FROM ordersystem WHERE orderNum = %s"
-        cursor.execute(query, (orderNumber,))
-        order_data = cursor.fetchone()
-
-        if not order_data:
+        order = fetch_order(cursor, orderNumber)
+        if not order:
             con.close()
             return jsonify({"error": True, "message": "Order does not exist"}), 404
 
-        attraction_id = order_data[3]
-        query_attraction = "SELECT name, address, rownumber FROM attractions WHERE id = %s"
-        cursor.execute(query_attraction, (attraction_id,))
-        attraction_data = cursor.fetchone()
-
-        if not attraction_data:
+        if not order["attraction_found"]:
             con.close()
             return jsonify({"error": True, "message": "Attraction data does not exist"}), 500
 
-        attraction_rownumber = attraction_data[2]
-        img_query = "SELECT imageUrl FROM attractionImages WHERE attractionRownumber = %s"
-        cursor.execute(img_query, (attraction_rownumber,))
-        img_data = cursor.fetchall()
-        image_url = img_data[0][0] if img_data else ""
-
         order_info = {
-            "number": order_data[1],
-            "price": order_data[6],
+            "number": order["number"],
+            "price": order["price"],
             "trip": {
                 "attraction": {
-                    "id": order_data[3],
-                    "name": attraction_data[0],
-                    "address": attraction_data[1],
-                    "image": image_url
+                    "id": order["attraction_id"],
+                    "name": order["attraction_name"],
+                    "address": order["attraction_address"],
+                    "image": order["attraction_image"] or ""
                 },
-                "date": order_data[4],
-                "time": order_data[5]
+                "date": order["date"],
+                "time": order["time"]
             },
             "contact": {
-                "name": order_data[8],
-                "email": order_data[7],
-                "phone": order_data[9],
+                "name": order["name"],
+                "email": order["email"],
+                "phone": order["phone"],
             },
-            "status": order_data[10]
+            "status": order["status"]
         }
 
         con.close()
         return jsonify({"data": order_info})
 
-    except jwt.ExpiredSignatureError:
-        logger.error("Token has expired")
-        return jsonify({"error": True, "message": "Token has expired"}), 400
-    except jwt.InvalidTokenError:
-        logger.error("Token is invalid")
-        return jsonify({"error": True, "message": "Invalid Token"}), 400
     except pymysql.MySQLError as e:
         logger.error(f"Database error: {e}")
         return jsonify({"error": True, "message": f"Database error: {str(e)}"}), 500
@@ -629,5 +575,15 @@ def show_trip(orderNumber):
         logger.error(f"Server error: {e}")
         return jsonify({"error": True, "message": "Internal server error"}), 500
 
+@app.route("/api/pool/stats", methods=["GET"])
+@admin_required
+def pool_stats():
+    return jsonify({"data": get_pool().stats()})
+
+@app.route("/metrics", methods=["GET"])
+@admin_required
+def prometheus_metrics():
+    return Response(metrics.render_prometheus(), mimetype="text/plain; version=0.0.4")
+
 if __name__ == "__main__":
     app.run(host="0.0.0.0", port=3000)
\ No newline at end of file
@@ -0,0 +1,104 @@
+"""Fingerprinted static assets.
+
+build() copies every file under static/ to static/dist/ with a content hash in its name
+(css/index-layout.css -> dist/css/index-layout.3f2a9c41d0be.css) and records the mapping in
+static/dist/manifest.json. Templates link through asset_url(), so a changed file gets a new
+URL and every URL can be cached for a year.
+
+    python assets.py        # run at image build or startup; gunicorn.conf.py also runs it
+"""
+import os
+import re
+import gzip
+import json
+import hashlib
+import logging
+
+from flask import request, url_for
+
+from workers import write_atomic
+
+logger = logging.getLogger(__name__)
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+DIST = "dist"
+MANIFEST_FILE = os.path.join(STATIC_DIR, DIST, "manifest.json")
+HASH_LENGTH = 12
+REWRITTEN = (".css", ".js")
+PRECOMPRESSED = (".css", ".js", ".svg")
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+STATIC_REFERENCE = re.compile(r"/static/([\w./-]+)")
+
+_manifest = {}
+
+
+def _sources(static_dir):
+    for root, dirs, files in os.walk(static_dir):
+        if os.path.relpath(root, static_dir) == ".":
+            dirs[:] = [d for d in dirs if d != DIST]
+        for name in files:
+            if name.startswith("."):
+                continue
+            yield os.path.relpath(os.path.join(root, name), static_dir).replace(os.sep, "/")
+
+
+def build(static_dir=STATIC_DIR):
+    """Write hashed copies of the static files and the manifest; returns the manifest."""
+    manifest = {}
+    # Images go first: stylesheets and scripts mention them, and their own hash must cover the rewritten text
+    for name in sorted(_sources(static_dir), key=lambda name: (name.endswith(REWRITTEN), name)):
+        with open(os.path.join(static_dir, name), "rb") as file:
+            data = file.read()
+        if name.endswith(REWRITTEN):
+            text = STATIC_REFERENCE.sub(lambda m: f"/static/{manifest.get(m.group(1), m.group(1))}", data.decode("utf-8"))
+            data = text.encode("utf-8")
+
+        root, ext = os.path.splitext(name)
+        hashed = f"{DIST}/{root}.{hashlib.sha256(data).hexdigest()[:HASH_LENGTH]}{ext}"
+        path = os.path.join(static_dir, hashed)
+        if not os.path.exists(path):
+            write_atomic(path, data)
+            if ext in PRECOMPRESSED:
+                # Picked up by nginx's gzip_static
+                write_atomic(f"{path}.gz", gzip.compress(data, compresslevel=9, mtime=0))
+        manifest[name] = hashed
+
+    # Older hashed files stay on disk so pages rendered before a deploy can still load them
+    write_atomic(os.path.join(static_dir, DIST, "manifest.json"), json.dumps(manifest, indent=2, sort_keys=True).encode("utf-8"))
+    return manifest
+
+
+def load_manifest(path=MANIFEST_FILE):
+    global _manifest
+    try:
+        with open(path, "r", encoding="utf-8") as file:
+            _manifest = json.load(file)
+    except FileNotFoundError:
+        logger.warning(f"No asset manifest at {path}; run assets.py. Serving unversioned static URLs")
+        _manifest = {}
+    return _manifest
+
+
+def asset_url(filename):
+    """URL of a static file, fingerprinted when the manifest knows it."""
+    return url_for("static", filename=_manifest.get(filename, filename))
+
+
+def _cache_fingerprinted(response):
+    if request.path.startswith(f"/static/{DIST}/") and response.status_code in (200, 304):
+        response.headers["Cache-Control"] = IMMUTABLE
+    return response
+
+
+def init_app(app):
+    # Development edits files in place, so keep plain URLs there
+    if not app.debug:
+        load_manifest()
+    app.jinja_env.globals["asset_url"] = asset_url
+    app.after_request(_cache_fingerprinted)
+
+
+if __name__ == "__main__":
+    manifest = build()
+    print(f"Fingerprinted {len(manifest)} static files into {os.path.join(STATIC_DIR, DIST)}")
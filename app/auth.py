@@ -0,0 +1,154 @@
+import os
+import hmac
+import time
+import logging
+import functools
+import threading
+from collections import OrderedDict
+
+import jwt
+import pymysql
+from flask import jsonify, request
+
+from database import get_db_connection
+
+logger = logging.getLogger(__name__)
+
+SECRET_KEY = os.getenv("JWT_SECRET", "My_secret_key")
+
+
+class LRUCache:
+    """Small thread-safe LRU whose entries also expire at a per-entry deadline (time.time())."""
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if time.time() >= expires_at:
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, expires_at):
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+token_cache = LRUCache(int(os.getenv("AUTH_TOKEN_CACHE_SIZE", 1024)))
+member_cache = LRUCache(int(os.getenv("AUTH_MEMBER_CACHE_SIZE", 1024)))
+TOKEN_CACHE_TTL = float(os.getenv("AUTH_TOKEN_CACHE_TTL", 300))
+MEMBER_CACHE_TTL = float(os.getenv("AUTH_MEMBER_CACHE_TTL", 60))
+
+
+def encode_token(user_info, expiration_time):
+    return jwt.encode({"data": user_info, "exp": expiration_time}, SECRET_KEY, algorithm="HS256")
+
+
+def verify_token(jwt_token):
+    """Decode a JWT once and remember the result until it expires or falls out of the cache."""
+    user_info = token_cache.get(jwt_token)
+    if user_info is not None:
+        return user_info
+
+    decode_token = jwt.decode(jwt_token, SECRET_KEY, algorithms=["HS256"])
+    user_info = decode_token.get("data", None)
+    if not user_info:
+        return None
+
+    expires_at = time.time() + TOKEN_CACHE_TTL
+    if "exp" in decode_token:
+        expires_at = min(expires_at, decode_token["exp"])
+    token_cache.set(jwt_token, user_info, expires_at)
+    return user_info
+
+
+def member_exists(user_id):
+    # Only positive answers are cached: ids are never reused and members are not deleted
+    if member_cache.get(user_id):
+        return True
+
+    con = get_db_connection()
+    cursor = con.cursor()
+    cursor.execute('SELECT id FROM membership WHERE id = %s', (user_id,))
+    if not cursor.fetchone():
+        return False
+    member_cache.set(user_id, True, time.time() + MEMBER_CACHE_TTL)
+    return True
+
+
+def login_required(silent=False):
+    """Authenticate the Bearer token and pass the token's user info to the view.
+
+    With silent=True failures answer {"data": None} the way GET /api/user/auth always has;
+    otherwise they answer {"error": True, "message": ...} with 403 or 400.
+    """
+    def failure(status, message):
+        if silent:
+            return jsonify({"data": None}), status
+        return jsonify({"error": True, "message": message}), status
+
+    def decorator(f):
+        @functools.wraps(f)
+        def decorated(*args, **kwargs):
+            token = request.headers.get("Authorization")
+            if not token:
+                return failure(200 if silent else 403, "Not logged in, access denied")
+
+            token_parts = token.split()
+            if len(token_parts) != 2 or token_parts[0].lower() != "bearer":
+                return failure(200 if silent else 403, "Invalid Token")
+
+            try:
+                current_user = verify_token(token_parts[1])
+                if not current_user or "id" not in current_user:
+                    return failure(200 if silent else 403, "Invalid Token")
+                if not member_exists(current_user["id"]):
+                    return failure(200 if silent else 403, "Member does not exist")
+            except jwt.ExpiredSignatureError:
+                logger.error("JWT Token has expired")
+                return failure(400, "Token has expired")
+            except jwt.InvalidTokenError as e:
+                logger.error(f"JWT Token is invalid: {str(e)}")
+                return failure(400, "Invalid Token")
+            except pymysql.MySQLError as e:
+                logger.error(f"Database error: {e}")
+                return jsonify({"error": True, "message": f"Database error: {str(e)}"}), 500
+
+            return f(current_user, *args, **kwargs)
+        return decorated
+    return decorator
+
+
+def admin_required(f):
+    """Let through only requests carrying ADMIN_TOKEN; nobody when it is unset.
+
+    The token goes in X-Admin-Token, or as "Authorization: Bearer <token>", which is what
+    Prometheus can send to a scrape target.
+    """
+    @functools.wraps(f)
+    def decorated(*args, **kwargs):
+        admin_token = os.getenv("ADMIN_TOKEN")
+        supplied = request.headers.get("X-Admin-Token", "")
+        authorization = request.headers.get("Authorization", "").split()
+        if not supplied and len(authorization) == 2 and authorization[0].lower() == "bearer":
+            supplied = authorization[1]
+        # Constant time, so response timing does not reveal how much of a guess was right
+        if not admin_token or not hmac.compare_digest(supplied.encode("utf-8"), admin_token.encode("utf-8")):
+            return jsonify({"error": True, "message": "Access denied"}), 403
+        return f(*args, **kwargs)
+    return decorated
@@ -0,0 +1,159 @@
+import os
+import time
+import logging
+import threading
+import bisect
+import hashlib
+from collections import OrderedDict, Counter
+
+from database import get_db_connection
+from queries import fetch_attractions
+from search import SearchIndex
+from geo import GeoIndex
+from serialization import Fragment
+
+logger = logging.getLogger(__name__)
+
+# Row counts and max ids catch rows any loader adds or removes. Updates in place leave them as
+# they were, so ingest.py and the admin reload also bump catalogue_version (migration 0007).
+VERSION_QUERY = (
+    "SELECT (SELECT COUNT(*) FROM attractions), (SELECT MAX(id) FROM attractions), "
+    "(SELECT COUNT(*) FROM attractionImages), (SELECT MAX(id) FROM attractionImages), "
+    "(SELECT MAX(version) FROM catalogue_version)"
+)
+BUMP_VERSION = "INSERT INTO catalogue_version (id, version) VALUES (1, 1) ON DUPLICATE KEY UPDATE version = version + 1"
+SEARCH_CACHE_SIZE = 256
+
+
+class CatalogueSnapshot:
+    """Immutable view of the attractions table and its images, built in one pass."""
+
+    def __init__(self, rows, image_rows, version):
+        self.version = version
+        self.loaded_at = time.time()
+
+        images = {}
+        for rownumber, image_url in image_rows:
+            images.setdefault(str(rownumber), []).append(image_url)
+
+        self.attractions = []
+        self.ids = []
+        self.by_id = {}
+        self.by_rownumber = {}
+        for row in rows:
+            attraction = OrderedDict()
+            attraction["id"] = row[0]
+            attraction["name"] = row[2]
+            attraction["category"] = row[3]
+            attraction["description"] = row[4]
+            attraction["address"] = row[5]
+            attraction["transport"] = row[6]
+            attraction["mrt"] = row[7]
+            attraction["lat"] = row[8]
+            attraction["lng"] = row[9]
+            attraction["images"] = images.get(str(row[1]), [])
+            self.attractions.append(attraction)
+            self.ids.append(row[0])
+            self.by_id[row[0]] = attraction
+            self.by_rownumber[str(row[1])] = attraction
+
+        # Encoded once per load; API responses splice these bytes instead of re-encoding each row
+        self.fragments = {attraction["id"]: Fragment(attraction) for attraction in self.attractions}
+
+        # Stations ordered by how many attractions they serve, first appearance breaks ties
+        counts = Counter(attraction["mrt"] for attraction in self.attractions)
+        self.mrt_ranking = [mrt for mrt, _ in counts.most_common()]
+        self.mrt_counts = [count for _, count in counts.most_common()]
+        self.mrt_etag = hashlib.sha1(repr(counts.most_common()).encode("utf-8")).hexdigest()
+
+        self.search_index = SearchIndex(self.attractions)
+        self.geo_index = GeoIndex(self.attractions)
+        self._search_results = {}
+
+    def search(self, keyword):
+        return self._search(keyword)[0]
+
+    def matches(self, keyword):
+        return self.search(keyword) if keyword else self.attractions
+
+    def start_after(self, keyword, last_id):
+        """Index in matches(keyword) just past the attraction with id last_id, or None if it is not there."""
+        if not keyword:
+            return bisect.bisect_right(self.ids, last_id)
+        position = self._search(keyword)[1].get(last_id)
+        return None if position is None else position + 1
+
+    def _search(self, keyword):
+        # Infinite scroll asks for the same keyword page after page, so keep recent result lists
+        cached = self._search_results.get(keyword)
+        if cached is None:
+            results = self.search_index.search(keyword)
+            cached = (results, {attraction["id"]: i for i, attraction in enumerate(results)})
+            if len(self._search_results) >= SEARCH_CACHE_SIZE:
+                self._search_results.clear()
+            self._search_results[keyword] = cached
+        return cached
+
+
+class Catalogue:
+    """Per-worker read-through cache of the attraction catalogue.
+
+    After `ttl` seconds the next reader compares a cheap version stamp (row counts, max ids and
+    the catalogue_version counter) with the one it loaded and only reloads when it moved.
+    invalidate() bumps the counter, so this worker reloads on the next access and every other
+    worker at its next check.
+    """
+
+    def __init__(self, ttl=300, retry_interval=10):
+        self.ttl = ttl
+        self.retry_interval = retry_interval
+        self._snapshot = None
+        self._expires_at = 0
+        self._stale = False
+        self._lock = threading.Lock()
+
+    def get(self):
+        snapshot = self._snapshot
+        if snapshot is not None and not self._stale and time.monotonic() < self._expires_at:
+            return snapshot
+
+        with self._lock:
+            snapshot = self._snapshot
+            if snapshot is not None and not self._stale and time.monotonic() < self._expires_at:
+                return snapshot
+            try:
+                self._refresh()
+            except Exception as e:
+                if self._snapshot is None:
+                    raise
+                logger.error(f"Catalogue refresh failed, serving cached copy: {e}")
+                self._expires_at = time.monotonic() + self.retry_interval
+            return self._snapshot
+
+    def invalidate(self):
+        con = get_db_connection()
+        cursor = con.cursor()
+        cursor.execute(BUMP_VERSION)
+        con.commit()
+        self._stale = True
+
+    def _refresh(self):
+        con = get_db_connection()
+        cursor = con.cursor()
+        cursor.execute(VERSION_QUERY)
+        version = tuple(cursor.fetchone())
+
+        if self._snapshot is None or self._stale or version != self._snapshot.version:
+            rows, image_rows = fetch_attractions(cursor)
+            self._snapshot = CatalogueSnapshot(rows, image_rows, version)
+            logger.info(f"Loaded catalogue: {len(rows)} attractions, {len(image_rows)} images")
+
+        self._stale = False
+        self._expires_at = time.monotonic() + self.ttl
+
+
+catalogue = Catalogue(ttl=float(os.getenv("CATALOGUE_TTL", 300)))
+
+
+def get_catalogue():
+    return catalogue.get()
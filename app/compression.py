@@ -0,0 +1,125 @@
+import os
+import gzip
+import threading
+from collections import OrderedDict
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_TYPES = ("application/json", "text/html")
+MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", 256))
+CACHE_BYTES = int(os.getenv("COMPRESSION_CACHE_BYTES", 8 * 1024 * 1024))
+
+# Preferred first; brotli is optional and only offered when the module is installed
+ENCODINGS = ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def compress(data, encoding, best=False):
+    """best=True spends more CPU for a smaller body; worth it when the result is cached."""
+    if encoding == "br":
+        return brotli.compress(data, quality=11 if best else 5)
+    return gzip.compress(data, compresslevel=9 if best else 6, mtime=0)
+
+
+class VariantCache:
+    """Compressed bodies keyed by (strong ETag, encoding), bounded by their total size."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            body = self._data.get(key)
+            if body is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._data.move_to_end(key)
+            return body
+
+    def set(self, key, body):
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._data.pop(key, None)
+            if previous is not None:
+                self.size -= len(previous)
+            self._data[key] = body
+            self.size += len(body)
+            while self.size > self.max_bytes:
+                _, evicted = self._data.popitem(last=False)
+                self.size -= len(evicted)
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._data), "bytes": self.size, "hits": self.hits, "misses": self.misses}
+
+
+variants = VariantCache(CACHE_BYTES)
+
+
+def _compressible(response):
+    return (
+        response.status_code == 200
+        and response.mimetype in COMPRESSIBLE_TYPES
+        and not response.direct_passthrough
+        and not response.is_streamed
+        and "Content-Encoding" not in response.headers
+        and "no-transform" not in response.headers.get("Cache-Control", "")
+    )
+
+
+def compress_response(response):
+    """Negotiate gzip or brotli for JSON and HTML responses.
+
+    Responses with a strong ETag (the cacheable routes) are compressed once at the best level
+    and the result is kept in `variants`, so repeated requests for the same content only pay
+    for a lookup. Their ETag turns weak, the way nginx marks gzipped responses, so a client's
+    W/"..." still revalidates against the uncompressed hash.
+    """
+    if response.status_code == 304:
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+        response.vary.add("Accept-Encoding")
+        return response
+    if not _compressible(response):
+        return response
+
+    response.vary.add("Accept-Encoding")
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+
+    encoding = request.accept_encodings.best_match(ENCODINGS)
+    if encoding is None:
+        return response
+    data = response.get_data()
+    if len(data) < MIN_SIZE:
+        return response
+
+    if etag and not weak:
+        key = (etag, encoding)
+        body = variants.get(key)
+        if body is None:
+            body = compress(data, encoding, best=True)
+            variants.set(key, body)
+    else:
+        body = compress(data, encoding)
+
+    response.set_data(body)
+    response.headers["Content-Encoding"] = encoding
+    return response
+
+
+def init_app(app):
+    app.after_request(compress_response)
@@ -0,0 +1,288 @@
+import os
+import re
+import time
+import logging
+import threading
+from collections import deque
+
+import pymysql
+from flask import g
+
+from metrics import record_query
+from workers import per_process
+
+logger = logging.getLogger(__name__)
+
+DUPLICATE_ENTRY = 1062
+
+
+class PoolTimeout(pymysql.err.OperationalError):
+    """Raised when no connection could be checked out before the timeout."""
+
+
+class InstrumentedCursor:
+    """Cursor wrapper that times every statement and reports it to the metrics registry."""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def execute(self, query, args=None):
+        started = time.perf_counter()
+        try:
+            return self._cursor.execute(query, args)
+        finally:
+            record_query(query, time.perf_counter() - started)
+
+    def executemany(self, query, args):
+        started = time.perf_counter()
+        try:
+            return self._cursor.executemany(query, args)
+        finally:
+            record_query(query, time.perf_counter() - started)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._cursor.close()
+
+
+class _PoolEntry:
+    """A raw connection owned by the pool, and when it was last handed back."""
+
+    __slots__ = ("con", "created_at", "last_used")
+
+    def __init__(self, con):
+        self.con = con
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+
+
+class PooledConnection:
+    """One checkout of a pooled connection; close() gives the connection back instead of dropping it.
+
+    Every checkout gets a new wrapper, so a second close() of a wrapper whose connection has
+    since gone to another request does nothing to that request.
+    """
+
+    def __init__(self, pool, entry):
+        self._pool = pool
+        self._entry = entry
+        self._con = entry.con
+        self.released = False
+
+    def __getattr__(self, name):
+        return getattr(self._con, name)
+
+    def cursor(self, *args):
+        return InstrumentedCursor(self._con.cursor(*args))
+
+    def close(self):
+        self._pool.release(self)
+
+
+class ConnectionPool:
+    """Bounded pool of pymysql connections, one pool per worker process."""
+
+    def __init__(self, connect, max_size=5, max_idle_time=300, checkout_timeout=10, health_check_interval=5):
+        self._connect = connect
+        self.max_size = max_size
+        self.max_idle_time = max_idle_time
+        self.checkout_timeout = checkout_timeout
+        self.health_check_interval = health_check_interval
+
+        self._idle = deque()
+        self._cond = threading.Condition()
+        self._size = 0
+        self._in_use = 0
+        self._waiting = 0
+        self._created = 0
+        self._closed = 0
+        self._checkouts = 0
+        self._timeouts = 0
+
+    def acquire(self):
+        deadline = time.monotonic() + self.checkout_timeout
+        with self._cond:
+            self._evict_idle()
+            while True:
+                if self._idle:
+                    entry = self._idle.pop()
+                    self._in_use += 1
+                    self._checkouts += 1
+                    break
+                if self._size < self.max_size:
+                    # Reserve the slot now, open the socket outside the lock
+                    self._size += 1
+                    self._in_use += 1
+                    self._checkouts += 1
+                    entry = None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._timeouts += 1
+                    raise PoolTimeout(f"No database connection available within {self.checkout_timeout}s")
+                self._waiting += 1
+                try:
+                    self._cond.wait(remaining)
+                finally:
+                    self._waiting -= 1
+
+        if entry is None:
+            return self._open()
+
+        if time.monotonic() - entry.last_used > self.health_check_interval:
+            try:
+                entry.con.ping(reconnect=False)
+            except Exception as e:
+                logger.warning(f"Discarding broken pooled connection: {e}")
+                self._close_quietly(entry.con)
+                with self._cond:
+                    self._closed += 1
+                # Reopen into the slot this checkout already holds
+                return self._open()
+        return PooledConnection(self, entry)
+
+    def release(self, pooled):
+        with self._cond:
+            if pooled.released:
+                return
+            pooled.released = True
+        entry = pooled._entry
+        try:
+            # End whatever transaction the request left open so the next user gets a fresh snapshot
+            entry.con.rollback()
+        except pymysql.MySQLError as e:
+            logger.warning(f"Discarding connection that failed to roll back: {e}")
+            self._discard(entry)
+            return
+
+        entry.last_used = time.monotonic()
+        with self._cond:
+            self._in_use -= 1
+            self._idle.append(entry)
+            self._cond.notify()
+
+    def stats(self):
+        with self._cond:
+            return {
+                "pid": os.getpid(),
+                "max_size": self.max_size,
+                "size": self._size,
+                "in_use": self._in_use,
+                "idle": len(self._idle),
+                "waiting": self._waiting,
+                "created": self._created,
+                "closed": self._closed,
+                "checkouts": self._checkouts,
+                "timeouts": self._timeouts,
+            }
+
+    def close_all(self):
+        with self._cond:
+            idle = list(self._idle)
+            self._idle.clear()
+            self._size -= len(idle)
+            self._closed += len(idle)
+        for entry in idle:
+            self._close_quietly(entry.con)
+
+    def _open(self):
+        try:
+            con = self._connect()
+        except Exception as e:
+            logger.error(f"Database connection failed: {e}")
+            with self._cond:
+                self._size -= 1
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self._created += 1
+        logger.info(f"Opened database connection ({self._size}/{self.max_size} in pool)")
+        return PooledConnection(self, _PoolEntry(con))
+
+    def _discard(self, entry):
+        self._close_quietly(entry.con)
+        with self._cond:
+            self._size -= 1
+            self._in_use -= 1
+            self._closed += 1
+            self._cond.notify()
+
+    def _evict_idle(self):
+        # Called with the lock held; oldest idle connections sit at the left end
+        now = time.monotonic()
+        while self._idle and now - self._idle[0].last_used > self.max_idle_time:
+            entry = self._idle.popleft()
+            self._size -= 1
+            self._closed += 1
+            self._close_quietly(entry.con)
+
+    @staticmethod
+    def _close_quietly(con):
+        try:
+            con.close()
+        except Exception:
+            pass
+
+
+def connect():
+    # PyMySQL is pure Python, so under an eventlet worker its socket waits yield to other
+    # greenlets; a C driver such as mysqlclient would block the whole worker instead
+    return pymysql.connect(
+        host=os.getenv("host"),
+        port=int(os.getenv("port")),
+        user=os.getenv("user"),
+        password=os.getenv("password"),
+        database=os.getenv("database"),
+        connect_timeout=60,  # Connection timeout 60 seconds
+        read_timeout=60,     # Read timeout 60 seconds
+        write_timeout=60     # Write timeout 60 seconds
+    )
+
+
+@per_process
+def get_pool():
+    return ConnectionPool(
+        connect,
+        max_size=int(os.getenv("DB_POOL_SIZE", 5)),
+        max_idle_time=float(os.getenv("DB_POOL_MAX_IDLE", 300)),
+        checkout_timeout=float(os.getenv("DB_POOL_TIMEOUT", 10)),
+        health_check_interval=float(os.getenv("DB_POOL_HEALTH_CHECK_INTERVAL", 5)),
+    )
+
+
+def is_duplicate_key(error, key):
+    """True when `error` is MySQL rejecting a row that would repeat the unique key named `key`."""
+    # MySQL 5.7 names the key as 'key', 8.0 as 'table.key'
+    return (
+        isinstance(error, pymysql.err.IntegrityError)
+        and error.args[0] == DUPLICATE_ENTRY
+        and re.search(rf"for key '(\w+\.)?{re.escape(key)}'$", str(error.args[1])) is not None
+    )
+
+
+def get_db_connection():
+    """Check out one connection for the current request; it is returned on teardown.
+
+    `g` is context-local, so each thread or greenlet serving a request holds its own connection.
+    """
+    con = g.get("db_con")
+    if con is None or con.released:
+        con = get_pool().acquire()
+        g.db_con = con
+    return con
+
+
+def release_db_connection(exception=None):
+    con = g.pop("db_con", None)
+    if con is not None:
+        con.close()
+
+
+def init_app(app):
+    app.teardown_appcontext(release_db_connection)
@@ -0,0 +1,163 @@
+import math
+import heapq
+
+EARTH_RADIUS_M = 6371008.8
+# Points per leaf of the KD-tree
+LEAF_SIZE = 12
+
+
+def haversine(lat1, lng1, lat2, lng2):
+    """Great-circle distance in metres between two points given in degrees."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lng2 - lng1)
+    return _distance(math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2)
+
+
+def _unit_vector(lat, lng):
+    phi, lam = math.radians(lat), math.radians(lng)
+    return math.cos(phi) * math.cos(lam), math.cos(phi) * math.sin(lam), math.sin(phi)
+
+
+class GeoIndex:
+    """KD-tree over attraction coordinates for radius and k-nearest queries.
+
+    Points are stored as 3-D unit vectors. The squared straight-line (chord) distance between
+    two of them is exactly 4 times haversine's `a` term, so ordering by it is ordering by
+    great-circle distance, and the distance from a query to a node's bounding box is a lower
+    bound that holds anywhere on the globe, poles and antimeridian included. The vectors are
+    rotated into an east/north/up frame at the catalogue's centre, so the boxes line up with
+    the patch of ground the attractions cover instead of cutting across it.
+
+    A query opens nodes nearest box first and stops once no unopened box is closer than the
+    k-th result (or the radius).
+    """
+
+    def __init__(self, attractions):
+        self._attractions = []
+        vectors = []
+        for attraction in attractions:
+            if attraction.get("lat") is None or attraction.get("lng") is None:
+                continue
+            self._attractions.append(attraction)
+            vectors.append(_unit_vector(float(attraction["lat"]), float(attraction["lng"])))
+
+        self._frame = _frame(vectors)
+        axes = [[ax * x + ay * y + az * z for x, y, z in vectors] for ax, ay, az in self._frame]
+        coords = list(zip(*axes))
+
+        # Node n covers order[start[n]:end[n]]; leaves have no children (left[n] == -1)
+        order = list(range(len(coords)))
+        self._left, self._right, self._start, self._end, self._box = [], [], [], [], []
+        if coords:
+            self._build(order, axes, 0, len(order))
+        # Leaves read their points in tree order, without going through the attraction dicts
+        self._coords = [coords[position] for position in order]
+        self._ids = [self._attractions[position]["id"] for position in order]
+        self._positions = order
+
+    def __len__(self):
+        return len(self._attractions)
+
+    def _rotate(self, vector):
+        return tuple(axis[0] * vector[0] + axis[1] * vector[1] + axis[2] * vector[2] for axis in self._frame)
+
+    def _build(self, order, axes, start, end):
+        node = len(self._left)
+        self._left.append(-1)
+        self._right.append(-1)
+        self._start.append(start)
+        self._end.append(end)
+        self._box.append(None)
+        if end - start <= LEAF_SIZE:
+            values = [[axis[p] for p in order[start:end]] for axis in axes]
+            self._box[node] = tuple(map(min, values)) + tuple(map(max, values))
+            return node
+
+        # Split the widest axis at its median, judged from a sample of the node's points
+        positions = order[start:end]
+        sample = positions[::max(1, len(positions) // 16)]
+        spreads = [max(values) - min(values) for values in ([axis[p] for p in sample] for axis in axes)]
+        axis = spreads.index(max(spreads))
+        positions.sort(key=axes[axis].__getitem__)
+        order[start:end] = positions
+        middle = (start + end) // 2
+        left = self._build(order, axes, start, middle)
+        right = self._build(order, axes, middle, end)
+        self._left[node], self._right[node] = left, right
+        a, b = self._box[left], self._box[right]
+        self._box[node] = tuple(min(a[k], b[k]) for k in range(3)) + tuple(max(a[k], b[k]) for k in range(3, 6))
+        return node
+
+    def nearest(self, lat, lng, limit, radius=None, exclude=None):
+        """Up to `limit` (distance in metres, attraction) pairs nearest first, within `radius` metres if given."""
+        if not self._attractions or limit <= 0:
+            return []
+        qx, qy, qz = self._rotate(_unit_vector(lat, lng))
+        # Everything below compares squared chord lengths; 4 * a converts from haversine's `a`
+        bound = 4 * _a(radius) if radius is not None else math.inf
+        boxes, lefts, rights, starts, ends = self._box, self._left, self._right, self._start, self._end
+        coords, ids, positions, attractions = self._coords, self._ids, self._positions, self._attractions
+        heappush, heappop, heapreplace = heapq.heappush, heapq.heappop, heapq.heapreplace
+
+        best = []  # max-heap by chord via negation, at most `limit` entries
+        pending = [(0.0, 0)]  # (squared distance to the node's box, node)
+        while pending:
+            floor, node = heappop(pending)
+            if floor > bound:
+                break
+            left = lefts[node]
+            if left < 0:
+                for i in range(starts[node], ends[node]):
+                    x, y, z = coords[i]
+                    dx, dy, dz = x - qx, y - qy, z - qz
+                    chord = dx * dx + dy * dy + dz * dz
+                    if chord > bound or ids[i] == exclude:
+                        continue
+                    entry = (-chord, -ids[i], i)
+                    if len(best) < limit:
+                        heappush(best, entry)
+                        if len(best) == limit:
+                            bound = -best[0][0]
+                    elif entry > best[0]:
+                        heapreplace(best, entry)
+                        bound = -best[0][0]
+                continue
+            for child in (left, rights[node]):
+                low_x, low_y, low_z, high_x, high_y, high_z = boxes[child]
+                dx = low_x - qx if qx < low_x else (qx - high_x if qx > high_x else 0.0)
+                dy = low_y - qy if qy < low_y else (qy - high_y if qy > high_y else 0.0)
+                dz = low_z - qz if qz < low_z else (qz - high_z if qz > high_z else 0.0)
+                floor = dx * dx + dy * dy + dz * dz
+                # Equal distances still count: an attraction with a lower id wins the tie
+                if floor <= bound:
+                    heappush(pending, (floor, child))
+
+        best.sort(reverse=True)
+        return [(_distance(-chord / 4), attractions[positions[i]]) for chord, _, i in best]
+
+
+def _frame(vectors):
+    """Orthonormal (east, north, up) axes at the mean of `vectors`."""
+    x, y, z = (sum(vector[axis] for vector in vectors) for axis in range(3))
+    norm = math.sqrt(x * x + y * y + z * z)
+    up = (x / norm, y / norm, z / norm) if norm > 1e-9 else (0.0, 0.0, 1.0)
+    # East is the pole axis crossed with up; at a pole any horizontal direction will do
+    east = (-up[1], up[0], 0.0)
+    length = math.hypot(east[0], east[1])
+    east = (east[0] / length, east[1] / length, 0.0) if length > 1e-9 else (1.0, 0.0, 0.0)
+    north = (
+        up[1] * east[2] - up[2] * east[1],
+        up[2] * east[0] - up[0] * east[2],
+        up[0] * east[1] - up[1] * east[0],
+    )
+    return east, north, up
+
+
+def _a(distance):
+    """Haversine's `a` for a great-circle distance in metres."""
+    return math.sin(min(distance / EARTH_RADIUS_M, math.pi) / 2) ** 2
+
+
+def _distance(a):
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(a)))
@@ -0,0 +1,77 @@
+"""Gunicorn server profile, configured from the environment.
+
+    gunicorn -c gunicorn.conf.py app:app
+
+GUNICORN_WORKER_CLASS picks the concurrency model (eventlet, gthread or sync). The worker
+count follows the CPU count and each worker's database pool is sized to what it can have in
+flight, capped so that all workers together stay under DB_MAX_CONNECTIONS.
+"""
+import os
+import sys
+import subprocess
+import multiprocessing
+
+GREEN_WORKERS = ("eventlet", "gevent")
+
+cpu_count = multiprocessing.cpu_count()
+
+# Only nginx, in the same container, talks to gunicorn. Reachable from outside, a client could
+# skip nginx and write its own X-Forwarded-For, which admission control trusts.
+bind = os.getenv("GUNICORN_BIND", "127.0.0.1:3000")
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "eventlet")
+
+if worker_class in GREEN_WORKERS:
+    # One process per core; waiting on MySQL and TapPay is spread over greenlets instead.
+    # Never fewer than two, so a worker being recycled does not leave the port unserved.
+    default_workers = max(2, cpu_count)
+elif worker_class == "gthread":
+    default_workers = cpu_count + 1
+else:
+    default_workers = cpu_count * 2 + 1
+workers = int(os.getenv("GUNICORN_WORKERS", default_workers))
+
+worker_connections = int(os.getenv("GUNICORN_WORKER_CONNECTIONS", 200))
+threads = int(os.getenv("GUNICORN_THREADS", 8))
+
+if worker_class in GREEN_WORKERS:
+    in_flight = worker_connections
+elif worker_class == "gthread":
+    in_flight = threads
+else:
+    in_flight = 1
+
+# Requests plus background payment jobs can each hold a connection, but the MySQL server's
+# connection limit is shared by every worker (and the ingest job), so split a fixed budget.
+payment_workers = int(os.getenv("PAYMENT_WORKERS", 4))
+db_budget = int(os.getenv("DB_MAX_CONNECTIONS", 100))
+os.environ.setdefault("DB_POOL_SIZE", str(max(1, min(in_flight + payment_workers, db_budget // workers))))
+# Admission control sheds load before a worker has more requests than it can run at once
+os.environ.setdefault("ADMISSION_MAX_IN_FLIGHT", str(in_flight))
+
+# Green workers monkey-patch sockets and locks when they boot; preloading would import the
+# app (and create its locks) in the master before that, so every worker loads its own copy.
+preload_app = False
+
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 30))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", 30))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", 5))
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", 10000))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", 1000))
+
+loglevel = os.getenv("GUNICORN_LOG_LEVEL", "info")
+capture_output = True
+enable_stdio_inheritance = True
+
+
+def on_starting(server):
+    # Fingerprint static files once, before any worker loads the manifest. A subprocess keeps
+    # Flask out of the master, so green workers still patch it before it is first imported.
+    app_dir = os.path.dirname(os.path.abspath(__file__))
+    subprocess.run([sys.executable, os.path.join(app_dir, "assets.py")], cwd=app_dir, check=True)
+
+
+def when_ready(server):
+    server.log.info(
+        f"Profile: {workers} x {worker_class} worker(s), {in_flight} request(s) in flight each, "
+        f"DB_POOL_SIZE={os.environ['DB_POOL_SIZE']}, ADMISSION_MAX_IN_FLIGHT={os.environ['ADMISSION_MAX_IN_FLIGHT']}"
+    )
@@ -0,0 +1,40 @@
+import os
+import functools
+from datetime import datetime, timezone
+
+from flask import current_app, request
+
+
+def cacheable(cache_control_key, last_modified=None):
+    """Add a content-hash ETag, Last-Modified and Cache-Control to successful GET responses
+    and turn matching conditional requests into 304 Not Modified.
+
+    cache_control_key names the app.config entry holding the Cache-Control value;
+    last_modified is an optional callable returning a POSIX timestamp.
+    """
+    def decorator(f):
+        @functools.wraps(f)
+        def decorated(*args, **kwargs):
+            response = current_app.make_response(f(*args, **kwargs))
+            if response.status_code != 200 or request.method not in ("GET", "HEAD"):
+                return response
+
+            if "ETag" not in response.headers:
+                response.add_etag()
+            if last_modified is not None:
+                response.last_modified = datetime.fromtimestamp(int(last_modified()), tz=timezone.utc)
+            if "Cache-Control" not in response.headers:
+                response.headers["Cache-Control"] = current_app.config[cache_control_key]
+            return response.make_conditional(request)
+        return decorated
+    return decorator
+
+
+def template_mtime(app, template_name):
+    path = os.path.join(app.root_path, app.template_folder, template_name)
+    return lambda: os.path.getmtime(path)
+
+
+def newest(*sources):
+    """last_modified for a response built from several sources: the latest of their timestamps."""
+    return lambda: max(source() for source in sources)
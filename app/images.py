@@ -0,0 +1,271 @@
+"""Local proxy for attraction images, with an on-disk cache and resized variants.
+
+/img/<attraction>/<n>?w=640 answers with the attraction's n-th image, at most 640 pixels
+wide. Each remote original is downloaded once and stored under the SHA-256 of its bytes, so
+the same picture behind two URLs is kept once. Variants are named after the original's hash
+and width, and made on demand, off the request's greenlet or thread. The cache is held under
+IMAGE_CACHE_BYTES by deleting the least recently served files.
+
+With IMAGE_ACCEL_REDIRECT set (start.sh sets it to /img-cache/), responses only carry an
+X-Accel-Redirect and nginx sends the file itself with sendfile.
+
+Resizing needs Pillow; without it, every width is served the original.
+"""
+import io
+import os
+import time
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from flask import Response, send_file
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+from workers import per_process, write_atomic
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR = os.getenv("IMAGE_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "images"))
+CACHE_BYTES = int(os.getenv("IMAGE_CACHE_BYTES", 1024 * 1024 * 1024))
+ACCEL_REDIRECT = os.getenv("IMAGE_ACCEL_REDIRECT")
+CACHE_CONTROL = os.getenv("IMAGE_CACHE_CONTROL", "public, max-age=604800")
+WIDTHS = (320, 640, 1280)
+JPEG_QUALITY = int(os.getenv("IMAGE_JPEG_QUALITY", 80))
+FETCH_TIMEOUT = float(os.getenv("IMAGE_FETCH_TIMEOUT", 10))
+MAX_ORIGINAL_BYTES = int(os.getenv("IMAGE_MAX_ORIGINAL_BYTES", 20 * 1024 * 1024))
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", 2))
+
+# A served file's access time is refreshed at most this often; eviction removes the oldest
+TOUCH_INTERVAL = 60
+# Sweep once this share of the budget has been written since the last sweep, down to LOW_WATER
+SWEEP_EVERY = 0.05
+LOW_WATER = 0.9
+
+
+class OriginError(Exception):
+    """The original image could not be fetched or is not an image."""
+
+
+def snap_width(value):
+    """The allowed width to serve for ?w=value: the smallest one at least that wide, or None for the original."""
+    if value is None or value == "":
+        return None
+    width = int(value)
+    if width <= 0:
+        raise ValueError("w must be positive")
+    for allowed in WIDTHS:
+        if allowed >= width:
+            return allowed
+    return WIDTHS[-1]
+
+
+def _sha256(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def resize(data, width):
+    """Re-encode an image at most `width` pixels wide; returns (bytes, extension, content type)."""
+    with Image.open(io.BytesIO(data)) as image:
+        if image.width > width:
+            # JPEGs can be decoded at 1/2, 1/4 or 1/8 scale, which is most of the saving
+            image.draft("RGB", (width, image.height * width // image.width))
+        image.load()
+        if image.width > width:
+            image.thumbnail((width, image.height * width // image.width + 1), Image.LANCZOS)
+        output = io.BytesIO()
+        if image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info):
+            image.save(output, format="PNG", optimize=True)
+            return output.getvalue(), "png", "image/png"
+        image.convert("RGB").save(output, format="JPEG", quality=JPEG_QUALITY, optimize=True, progressive=True)
+        return output.getvalue(), "jpg", "image/jpeg"
+
+
+class ImageCache:
+    """Content-addressed image files under one directory, bounded by their total size.
+
+        urls/<sha256 of url>               hash and content type of the url's original
+        originals/<ab>/<hash>              the original bytes
+        variants/<ab>/<hash>-<width>.<ext> resized copies
+
+    Every worker process on the host shares the directory. Files are written atomically and
+    named by content, so two workers racing on the same image just write the same bytes.
+    """
+
+    def __init__(self, directory, max_bytes, session=None):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.session = session or requests.Session()
+        self.fetches = 0
+        self._written = 0
+        self._lock = threading.Lock()
+        self._inflight = {}
+
+    def _path(self, *parts):
+        return os.path.join(self.directory, *parts)
+
+    def original_path(self, digest):
+        return self._path("originals", digest[:2], digest)
+
+    def _touch(self, path):
+        """Mark a cached file as just used; returns False if it has been evicted."""
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return False
+        now = time.time()
+        if now - stat.st_atime > TOUCH_INTERVAL:
+            # Only the access time moves, so nginx's Last-Modified and ETag stay put
+            os.utime(path, (now, stat.st_mtime))
+        return True
+
+    def original(self, url):
+        """(hash, content type) of the url's original, downloading it the first time."""
+        url_file = self._path("urls", _sha256(url.encode("utf-8")))
+        try:
+            with open(url_file, "r", encoding="utf-8") as file:
+                digest, content_type = file.read().split(" ", 1)
+            if self._touch(self.original_path(digest)):
+                return digest, content_type
+        except (FileNotFoundError, ValueError):
+            pass
+
+        # One download per url per process, however many requests want it at once
+        with self._lock:
+            event = self._inflight.get(url)
+            leader = event is None
+            if leader:
+                event = self._inflight[url] = threading.Event()
+        if not leader:
+            event.wait(FETCH_TIMEOUT * 2)
+            return self.original(url) if os.path.exists(url_file) else self._fetch(url, url_file)
+        try:
+            return self._fetch(url, url_file)
+        finally:
+            with self._lock:
+                self._inflight.pop(url, None)
+            event.set()
+
+    def _fetch(self, url, url_file):
+        try:
+            reply = self.session.get(url, timeout=FETCH_TIMEOUT, stream=True)
+            reply.raise_for_status()
+            content_type = reply.headers.get("Content-Type", "").split(";")[0].strip()
+            if not content_type.startswith("image/"):
+                raise OriginError(f"{url} is {content_type or 'untyped'}, not an image")
+            chunks = []
+            size = 0
+            for chunk in reply.iter_content(64 * 1024):
+                size += len(chunk)
+                if size > MAX_ORIGINAL_BYTES:
+                    raise OriginError(f"{url} is larger than {MAX_ORIGINAL_BYTES} bytes")
+                chunks.append(chunk)
+        except requests.RequestException as e:
+            raise OriginError(f"Could not fetch {url}: {e}") from e
+        data = b"".join(chunks)
+        digest = _sha256(data)
+        with self._lock:
+            self.fetches += 1
+        self._store(self.original_path(digest), data)
+        write_atomic(url_file, f"{digest} {content_type}".encode("utf-8"))
+        return digest, content_type
+
+    def variant(self, digest, content_type, width):
+        """Path and content type of the original resized to `width`, made the first time it is asked for."""
+        for ext, variant_type in (("jpg", "image/jpeg"), ("png", "image/png")):
+            path = self._path("variants", digest[:2], f"{digest}-{width}.{ext}")
+            if self._touch(path):
+                return path, variant_type
+        with open(self.original_path(digest), "rb") as file:
+            data = file.read()
+        try:
+            body, ext, variant_type = run_blocking(resize, data, width)
+        except Exception as e:
+            # Not something Pillow can read (an SVG, say): keep serving the original
+            logger.warning(f"Could not resize image {digest}: {e}")
+            return self.original_path(digest), content_type
+        path = self._path("variants", digest[:2], f"{digest}-{width}.{ext}")
+        self._store(path, body)
+        return path, variant_type
+
+    def _store(self, path, data):
+        write_atomic(path, data)
+        with self._lock:
+            self._written += len(data)
+            due = self._written >= self.max_bytes * SWEEP_EVERY
+            if due:
+                self._written = 0
+        if due:
+            executor().submit(self.sweep)
+
+    def sweep(self):
+        """Delete the least recently served originals and variants until the cache is under budget."""
+        files = []
+        for kind in ("originals", "variants"):
+            for root, _, names in os.walk(self._path(kind)):
+                for name in names:
+                    path = os.path.join(root, name)
+                    try:
+                        stat = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    files.append((stat.st_atime, stat.st_size, path))
+        total = sum(size for _, size, _ in files)
+        if total <= self.max_bytes:
+            return 0
+        removed = 0
+        for _, size, path in sorted(files):
+            if total <= self.max_bytes * LOW_WATER:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed += 1
+        logger.info(f"Image cache sweep removed {removed} files, {total} bytes left")
+        return removed
+
+
+@per_process
+def executor():
+    return ThreadPoolExecutor(max_workers=IMAGE_WORKERS, thread_name_prefix="images")
+
+
+def run_blocking(fn, *args):
+    """Run CPU-bound work on a pool thread and wait for it without blocking other requests."""
+    try:
+        from eventlet import patcher, tpool
+        if patcher.is_monkey_patched("thread"):
+            # Under eventlet the pool's threads are greenlets; tpool uses real OS threads
+            return tpool.execute(fn, *args)
+    except ImportError:
+        pass
+    return executor().submit(fn, *args).result()
+
+
+cache = ImageCache(CACHE_DIR, CACHE_BYTES)
+
+
+def serve(url, width=None):
+    """Response for the image at `url`, resized to `width` (None for the original)."""
+    digest, content_type = cache.original(url)
+    if width is None or Image is None:
+        path = cache.original_path(digest)
+        etag = digest
+    else:
+        path, content_type = cache.variant(digest, content_type, width)
+        etag = f"{digest}-{width}"
+
+    if ACCEL_REDIRECT:
+        response = Response(status=200, mimetype=content_type)
+        response.headers["X-Accel-Redirect"] = ACCEL_REDIRECT + os.path.relpath(path, cache.directory).replace(os.sep, "/")
+    else:
+        response = send_file(path, mimetype=content_type, etag=etag, conditional=True, max_age=None)
+    response.headers["Cache-Control"] = CACHE_CONTROL
+    return response
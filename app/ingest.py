@@ -0,0 +1,215 @@
+"""Load taipei-attractions.json into MySQL.
+
+    python ingest.py data/taipei-attractions.json [--dry-run] [--prune] [--batch-size 500]
+
+The JSON is streamed one attraction at a time, compared with what is already loaded, and only
+new or changed attractions are written: batched upserts keyed by rownumber, inside a single
+transaction. Re-running it on an unchanged file writes nothing.
+
+The upsert needs the unique key on attractions.rownumber from migration 0002 (run
+`python migrate.py` first); without it every changed attraction would be inserted again, so
+ingest refuses to write until the key exists. Every run that writes also bumps
+catalogue_version (migration 0007), so each app worker reloads its catalogue at its next check.
+"""
+import re
+import sys
+import json
+import time
+import argparse
+
+from dotenv import load_dotenv
+
+from catalogue import BUMP_VERSION
+
+ATTRACTION_COLUMNS = ("rownumber", "name", "category", "description", "address", "transport", "mrt", "latitude", "longitude")
+UPSERT_ATTRACTION = (
+    f"INSERT INTO attractions ({', '.join(ATTRACTION_COLUMNS)}) "
+    f"VALUES ({', '.join(['%s'] * len(ATTRACTION_COLUMNS))}) "
+    "ON DUPLICATE KEY UPDATE "
+    + ", ".join(f"{column} = VALUES({column})" for column in ATTRACTION_COLUMNS[1:])
+)
+INSERT_IMAGE = "INSERT INTO attractionImages (attractionRownumber, imageUrl) VALUES (%s, %s)"
+# Unique keys on exactly (rownumber), which ON DUPLICATE KEY UPDATE needs to find the existing row
+ROWNUMBER_KEY_QUERY = (
+    "SELECT INDEX_NAME FROM information_schema.STATISTICS "
+    "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'attractions' AND NON_UNIQUE = 0 "
+    "GROUP BY INDEX_NAME HAVING COUNT(*) = 1 AND MAX(COLUMN_NAME) = 'rownumber'"
+)
+
+
+def iter_results(path, chunk_size=1 << 16):
+    """Yield the objects of result.results without loading the whole file."""
+    decoder = json.JSONDecoder()
+    with open(path, "r", encoding="utf-8") as file:
+        buffer = ""
+        while True:
+            chunk = file.read(chunk_size)
+            if not chunk:
+                raise ValueError(f"{path}: no result.results array found")
+            buffer += chunk
+            match = re.search(r'"results"\s*:\s*\[', buffer)
+            if match:
+                buffer = buffer[match.end():]
+                break
+            # Keep a tail in case the key is split across two chunks
+            buffer = buffer[-32:]
+
+        while True:
+            buffer = buffer.lstrip(" \t\r\n,")
+            if buffer.startswith("]"):
+                return
+            try:
+                if not buffer:
+                    raise json.JSONDecodeError("Need more data", buffer, 0)
+                result, end = decoder.raw_decode(buffer)
+            except json.JSONDecodeError:
+                chunk = file.read(chunk_size)
+                if not chunk:
+                    raise
+                buffer += chunk
+                continue
+            yield result
+            buffer = buffer[end:]
+
+
+def split_images(file_field):
+    """The `file` field is every image URL glued together; keep the .jpg/.png ones in order."""
+    urls = []
+    for url in (file_field or "").split("https://")[1:]:
+        image_url = "https://" + url.strip()
+        if image_url.lower().endswith(('.jpg', '.png')) and image_url not in urls:
+            urls.append(image_url)
+    return urls
+
+
+def normalize(result):
+    def text(value):
+        value = (value or "").strip()
+        return value or None
+
+    attraction = (
+        int(result["RowNumber"]),
+        text(result["name"]),
+        text(result["CAT"]),
+        text(result["description"]),
+        text(result["address"]),
+        text(result["direction"]),
+        text(result["MRT"]),
+        float(result["latitude"]),
+        float(result["longitude"]),
+    )
+    return attraction, split_images(result["file"])
+
+
+def fingerprint(attraction, images):
+    # Compare on text with coordinates rounded, so DECIMAL/VARCHAR/FLOAT columns all match the JSON
+    values = [None if value is None else str(value) for value in attraction[:7]]
+    values += [None if value is None else round(float(value), 6) for value in attraction[7:9]]
+    values[0] = int(values[0])
+    return tuple(values), tuple(images)
+
+
+def load_existing(cursor):
+    cursor.execute(f"SELECT {', '.join(ATTRACTION_COLUMNS)} FROM attractions")
+    attractions = cursor.fetchall()
+    cursor.execute("SELECT attractionRownumber, imageUrl FROM attractionImages")
+    images = {}
+    for rownumber, image_url in cursor.fetchall():
+        images.setdefault(int(rownumber), []).append(image_url)
+    return {int(row[0]): fingerprint(row, images.get(int(row[0]), [])) for row in attractions}
+
+
+def require_rownumber_key(cursor):
+    cursor.execute(ROWNUMBER_KEY_QUERY)
+    if not cursor.fetchall():
+        raise RuntimeError(
+            "attractions.rownumber has no unique key, so the upsert would insert changed attractions "
+            "again instead of updating them. Run python migrate.py (migration 0002 adds it) and retry."
+        )
+
+
+def batched(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def ingest(con, path, batch_size=500, prune=False, dry_run=False):
+    started = time.perf_counter()
+    cursor = con.cursor()
+    existing = load_existing(cursor)
+
+    changed = []
+    seen = set()
+    total = 0
+    for result in iter_results(path):
+        total += 1
+        attraction, images = normalize(result)
+        rownumber = attraction[0]
+        seen.add(rownumber)
+        if existing.get(rownumber) != fingerprint(attraction, images):
+            changed.append((attraction, images))
+    removed = sorted(set(existing) - seen) if prune else []
+
+    stats = {
+        "read": total,
+        "inserted": sum(1 for attraction, _ in changed if attraction[0] not in existing),
+        "updated": sum(1 for attraction, _ in changed if attraction[0] in existing),
+        "unchanged": total - len(changed),
+        "removed": len(removed),
+        "images": sum(len(images) for _, images in changed),
+    }
+    if dry_run:
+        stats["seconds"] = round(time.perf_counter() - started, 3)
+        return stats
+
+    require_rownumber_key(cursor)
+    try:
+        for batch in batched(changed, batch_size):
+            cursor.executemany(UPSERT_ATTRACTION, [attraction for attraction, _ in batch])
+            rownumbers = [attraction[0] for attraction, _ in batch]
+            placeholders = ", ".join(["%s"] * len(rownumbers))
+            cursor.execute(f"DELETE FROM attractionImages WHERE attractionRownumber IN ({placeholders})", rownumbers)
+            image_rows = [(attraction[0], url) for attraction, images in batch for url in images]
+            if image_rows:
+                cursor.executemany(INSERT_IMAGE, image_rows)
+
+        for batch in batched(removed, batch_size):
+            placeholders = ", ".join(["%s"] * len(batch))
+            cursor.execute(f"DELETE FROM attractionImages WHERE attractionRownumber IN ({placeholders})", batch)
+            cursor.execute(f"DELETE FROM attractions WHERE rownumber IN ({placeholders})", batch)
+        if changed or removed:
+            # Tells every worker's catalogue cache to reload, updates in place included
+            cursor.execute(BUMP_VERSION)
+        con.commit()
+    except Exception:
+        con.rollback()
+        raise
+
+    seconds = time.perf_counter() - started
+    stats["seconds"] = round(seconds, 3)
+    stats["rows_per_sec"] = round(total / seconds) if seconds else None
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", nargs="?", default="data/taipei-attractions.json")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--prune", action="store_true", help="delete attractions that are no longer in the file")
+    parser.add_argument("--dry-run", action="store_true", help="only report what would change")
+    args = parser.parse_args()
+
+    load_dotenv()
+    from database import connect
+
+    con = connect()
+    try:
+        stats = ingest(con, args.path, batch_size=args.batch_size, prune=args.prune, dry_run=args.dry_run)
+    finally:
+        con.close()
+    print(json.dumps(stats))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,262 @@
+import os
+import json
+import time
+import logging
+import tempfile
+import threading
+from collections import defaultdict
+
+from flask import g, has_request_context, request
+
+from serialization import FastJSONProvider
+from workers import write_atomic
+
+logger = logging.getLogger(__name__)
+
+METRICS_DIR = os.getenv("METRICS_DIR", os.path.join(tempfile.gettempdir(), "taipeidaytrip-metrics"))
+FLUSH_INTERVAL = float(os.getenv("METRICS_FLUSH_INTERVAL", 1))
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", 100))
+
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1)
+
+HELP = {
+    "http_requests_total": ("counter", "Requests served, by route, method and status."),
+    "http_request_duration_seconds": ("histogram", "Time spent in the Flask view and hooks, by route."),
+    "db_queries_total": ("counter", "SQL statements executed, by route."),
+    "db_query_duration_seconds": ("histogram", "Time per SQL statement."),
+    "db_slow_queries_total": ("counter", "SQL statements slower than SLOW_QUERY_MS."),
+    "json_serialize_seconds_total": ("counter", "Time spent encoding JSON responses, by route."),
+    "db_pool_in_use": ("gauge", "Pooled connections checked out, summed over workers."),
+    "db_pool_idle": ("gauge", "Pooled connections waiting for reuse, summed over workers."),
+    "db_pool_waiting": ("gauge", "Requests waiting for a pooled connection, summed over workers."),
+    "db_pool_connections_created": ("gauge", "Connections opened since the workers started."),
+    "compression_cache_bytes": ("gauge", "Size of the cached compressed response bodies, summed over workers."),
+    "compression_cache_hits": ("gauge", "Compressed bodies served from the cache since the workers started."),
+    "compression_cache_misses": ("gauge", "Compressed bodies built and cached since the workers started."),
+    "admission_rejected_total": ("counter", "Requests turned away by admission control, by route class and reason."),
+    "admission_in_flight": ("gauge", "Requests admitted and not yet finished, summed over workers."),
+}
+
+
+class Registry:
+    """Counters and cumulative-bucket histograms for one worker process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = defaultdict(float)
+        self.histograms = {}
+        self.gauge_sources = []
+
+    def inc(self, name, labels=(), value=1):
+        with self._lock:
+            self.counters[(name, labels)] += value
+
+    def observe(self, name, value, buckets, labels=()):
+        with self._lock:
+            histogram = self.histograms.get((name, labels))
+            if histogram is None:
+                histogram = self.histograms[(name, labels)] = {"buckets": buckets, "counts": [0] * len(buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    histogram["counts"][i] += 1
+            histogram["sum"] += value
+            histogram["count"] += 1
+
+    def snapshot(self):
+        gauges = []
+        for source in self.gauge_sources:
+            try:
+                gauges.extend([name, [], value] for name, value in source().items())
+            except Exception as e:
+                logger.error(f"Gauge collection failed: {e}")
+        with self._lock:
+            return {
+                "counters": [[name, list(labels), value] for (name, labels), value in self.counters.items()],
+                "histograms": [[name, list(labels), dict(histogram, counts=list(histogram["counts"]))]
+                               for (name, labels), histogram in self.histograms.items()],
+                "gauges": gauges,
+            }
+
+
+registry = Registry()
+_last_flush = 0.0
+_flush_lock = threading.Lock()
+
+
+def register_gauges(source):
+    """source() returns {metric_name: value}; values are summed across workers."""
+    registry.gauge_sources.append(source)
+
+
+def route_label():
+    return request.url_rule.rule if request.url_rule is not None else "unmatched"
+
+
+def record_query(query, seconds):
+    registry.observe("db_query_duration_seconds", seconds, QUERY_BUCKETS)
+    route = "background"
+    if has_request_context():
+        g.db_queries = g.get("db_queries", 0) + 1
+        g.db_time = g.get("db_time", 0.0) + seconds
+        route = route_label()
+    registry.inc("db_queries_total", (("route", route),))
+    if seconds * 1000 >= SLOW_QUERY_MS:
+        registry.inc("db_slow_queries_total")
+        logger.warning(f"Slow query ({seconds * 1000:.1f} ms) on {route}: {' '.join(str(query).split())}")
+
+
+def record_serialize(seconds):
+    if has_request_context():
+        g.serialize_time = g.get("serialize_time", 0.0) + seconds
+
+
+class TimedJSONProvider(FastJSONProvider):
+    """The app's JSON provider, with encoding time reported in Server-Timing."""
+
+    def dumps(self, obj, **kwargs):
+        started = time.perf_counter()
+        try:
+            return super().dumps(obj, **kwargs)
+        finally:
+            record_serialize(time.perf_counter() - started)
+
+
+def _start_timer():
+    g.request_started = time.perf_counter()
+
+
+def _finish_timer(response):
+    started = g.get("request_started")
+    if started is None:
+        return response
+    total = time.perf_counter() - started
+    route = route_label()
+    db_time = g.get("db_time", 0.0)
+    serialize_time = g.get("serialize_time", 0.0)
+
+    registry.inc("http_requests_total", (("route", route), ("method", request.method), ("status", str(response.status_code))))
+    registry.observe("http_request_duration_seconds", total, REQUEST_BUCKETS, (("route", route),))
+    if serialize_time:
+        registry.inc("json_serialize_seconds_total", (("route", route),), serialize_time)
+
+    response.headers["Server-Timing"] = (
+        f'db;dur={db_time * 1000:.2f};desc="{g.get("db_queries", 0)} queries", '
+        f"serialize;dur={serialize_time * 1000:.2f}, "
+        f"total;dur={total * 1000:.2f}"
+    )
+    maybe_flush()
+    return response
+
+
+def flush():
+    """Write this worker's metrics where any worker serving /metrics can read them."""
+    global _last_flush
+    path = os.path.join(METRICS_DIR, f"worker-{os.getpid()}.json")
+    write_atomic(path, json.dumps(registry.snapshot()).encode("utf-8"))
+    _last_flush = time.monotonic()
+
+
+def maybe_flush():
+    if time.monotonic() - _last_flush < FLUSH_INTERVAL or not _flush_lock.acquire(blocking=False):
+        return
+    try:
+        flush()
+    except OSError as e:
+        logger.error(f"Could not write metrics: {e}")
+    finally:
+        _flush_lock.release()
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _load_worker_snapshots():
+    snapshots = []
+    for name in os.listdir(METRICS_DIR):
+        if not (name.startswith("worker-") and name.endswith(".json")):
+            continue
+        pid = int(name[len("worker-"):-len(".json")])
+        path = os.path.join(METRICS_DIR, name)
+        if not _pid_alive(pid):
+            # Restarted workers leave their file behind; counters reset like any process restart
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            continue
+        try:
+            with open(path, "r", encoding="utf-8") as file:
+                snapshots.append(json.load(file))
+        except (OSError, ValueError):
+            continue
+    return snapshots
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in pairs) + "}"
+
+
+def render_prometheus():
+    """Sum every live worker's snapshot and render it in the Prometheus text format."""
+    flush()
+    counters = defaultdict(float)
+    gauges = defaultdict(float)
+    histograms = {}
+    for snapshot in _load_worker_snapshots():
+        for name, labels, value in snapshot["counters"]:
+            counters[(name, tuple(map(tuple, labels)))] += value
+        for name, labels, value in snapshot["gauges"]:
+            gauges[(name, tuple(map(tuple, labels)))] += value
+        for name, labels, histogram in snapshot["histograms"]:
+            key = (name, tuple(map(tuple, labels)))
+            merged = histograms.setdefault(key, {"buckets": histogram["buckets"], "counts": [0] * len(histogram["buckets"]), "sum": 0.0, "count": 0})
+            merged["counts"] = [a + b for a, b in zip(merged["counts"], histogram["counts"])]
+            merged["sum"] += histogram["sum"]
+            merged["count"] += histogram["count"]
+
+    lines = []
+    typed = set()
+
+    def header(name, kind):
+        if name in typed:
+            return
+        typed.add(name)
+        help_text = HELP.get(name, (kind, name))[1]
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+
+    for (name, labels), value in sorted(counters.items()):
+        header(name, "counter")
+        lines.append(f"{name}{_format_labels(labels)} {value:g}")
+    for (name, labels), value in sorted(gauges.items()):
+        header(name, "gauge")
+        lines.append(f"{name}{_format_labels(labels)} {value:g}")
+    for (name, labels), histogram in sorted(histograms.items()):
+        header(name, "histogram")
+        for bound, count in zip(histogram["buckets"], histogram["counts"]):
+            lines.append(f"{name}_bucket{_format_labels(labels, [('le', f'{bound:g}')])} {count}")
+        lines.append(f"{name}_bucket{_format_labels(labels, [('le', '+Inf')])} {histogram['count']}")
+        lines.append(f"{name}_sum{_format_labels(labels)} {histogram['sum']:g}")
+        lines.append(f"{name}_count{_format_labels(labels)} {histogram['count']}")
+    return "\n".join(lines) + "\n"
+
+
+def init_app(app):
+    app.json = TimedJSONProvider(app)
+    app.before_request(_start_timer)
+    app.after_request(_finish_timer)
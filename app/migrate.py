@@ -0,0 +1,132 @@
+"""Apply the versioned schema migrations in migrations/ to MySQL.
+
+    python migrate.py            # apply every migration not yet recorded
+    python migrate.py --status   # list migrations and whether they are applied
+
+Files are named NNNN_description.sql and run in version order. Each applied version is
+recorded in schema_migrations. MySQL commits DDL statement by statement, so a migration that
+fails halfway is re-run from the top: statements whose table or index already exists (or
+whose index is already dropped) are skipped, which makes every file safe to apply again.
+"""
+import os
+import re
+import sys
+import json
+import argparse
+
+import pymysql
+from dotenv import load_dotenv
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+MIGRATION_FILE = re.compile(r"^(\d+)_(\w+)\.sql$")
+LOCK_NAME = "taipeidaytrip_migrate"
+LOCK_TIMEOUT = 60
+
+# Table exists, column exists, index name exists, index to drop is gone: the statement already took effect
+ALREADY_APPLIED = {1050, 1060, 1061, 1091}
+DUPLICATE_ENTRY = 1062
+
+CREATE_VERSION_TABLE = (
+    "CREATE TABLE IF NOT EXISTS schema_migrations ("
+    "version INT NOT NULL PRIMARY KEY, "
+    "name VARCHAR(255) NOT NULL, "
+    "applied_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP"
+    ") ENGINE=InnoDB DEFAULT CHARSET=utf8mb4"
+)
+
+
+def load_migrations(directory=MIGRATIONS_DIR):
+    """[(version, name, path)] in version order."""
+    migrations = []
+    for filename in os.listdir(directory):
+        match = MIGRATION_FILE.match(filename)
+        if match:
+            migrations.append((int(match.group(1)), match.group(2), os.path.join(directory, filename)))
+    migrations.sort()
+    versions = [version for version, _, _ in migrations]
+    if len(versions) != len(set(versions)):
+        raise ValueError(f"Duplicate migration version in {directory}")
+    return migrations
+
+
+def split_statements(sql):
+    """The statements of a migration file, without comments. Statements end with ';' at end of line."""
+    lines = [line for line in sql.splitlines() if not line.strip().startswith("--")]
+    statements = re.split(r";\s*$", "\n".join(lines), flags=re.MULTILINE)
+    return [statement.strip() for statement in statements if statement.strip()]
+
+
+def applied_versions(cursor):
+    cursor.execute(CREATE_VERSION_TABLE)
+    cursor.execute("SELECT version FROM schema_migrations")
+    return {row[0] for row in cursor.fetchall()}
+
+
+def apply(con, version, name, path):
+    with open(path, "r", encoding="utf-8") as file:
+        statements = split_statements(file.read())
+    cursor = con.cursor()
+    for statement in statements:
+        try:
+            cursor.execute(statement)
+        except pymysql.MySQLError as e:
+            code = e.args[0] if e.args else None
+            if code in ALREADY_APPLIED:
+                print(f"  {version:04d}: already applied, skipping: {e.args[1]}")
+                continue
+            if code == DUPLICATE_ENTRY:
+                raise RuntimeError(
+                    f"Migration {version:04d}_{name} adds a unique key but the table has duplicate rows "
+                    f"({e.args[1]}). Remove the duplicates and run migrate.py again."
+                ) from e
+            raise
+    cursor.execute("INSERT INTO schema_migrations (version, name) VALUES (%s, %s)", (version, name))
+    con.commit()
+
+
+def migrate(con, directory=MIGRATIONS_DIR):
+    """Apply pending migrations in order; returns the versions applied."""
+    cursor = con.cursor()
+    # Several containers may start at once; only one of them runs the DDL
+    cursor.execute("SELECT GET_LOCK(%s, %s)", (LOCK_NAME, LOCK_TIMEOUT))
+    if cursor.fetchone()[0] != 1:
+        raise RuntimeError(f"Another migrate.py held the {LOCK_NAME} lock for {LOCK_TIMEOUT}s")
+    try:
+        done = applied_versions(cursor)
+        applied = []
+        for version, name, path in load_migrations(directory):
+            if version in done:
+                continue
+            print(f"Applying {version:04d}_{name}")
+            apply(con, version, name, path)
+            applied.append(version)
+        return applied
+    finally:
+        cursor.execute("SELECT RELEASE_LOCK(%s)", (LOCK_NAME,))
+        cursor.fetchall()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--status", action="store_true", help="list migrations instead of applying them")
+    args = parser.parse_args()
+
+    load_dotenv()
+    from database import connect
+
+    con = connect()
+    try:
+        if args.status:
+            done = applied_versions(con.cursor())
+            status = {f"{version:04d}_{name}": version in done for version, name, _ in load_migrations()}
+            print(json.dumps(status, indent=2))
+        else:
+            applied = migrate(con)
+            print(f"Applied {len(applied)} migration(s)" if applied else "Schema is up to date")
+    finally:
+        con.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
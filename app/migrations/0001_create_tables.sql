@@ -0,0 +1,51 @@
+-- Tables as the app has always used them. IF NOT EXISTS leaves databases that were set up
+-- by hand before migrations existed untouched; 0002 then adds what they are missing.
+
+CREATE TABLE IF NOT EXISTS attractions (
+    id INT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+    rownumber INT NOT NULL,
+    name VARCHAR(255) NOT NULL,
+    category VARCHAR(255),
+    description TEXT,
+    address VARCHAR(255),
+    transport TEXT,
+    mrt VARCHAR(255),
+    latitude DOUBLE,
+    longitude DOUBLE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE IF NOT EXISTS attractionImages (
+    id INT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+    attractionRownumber INT NOT NULL,
+    imageUrl VARCHAR(1024) NOT NULL
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE IF NOT EXISTS membership (
+    id INT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+    name VARCHAR(255) NOT NULL,
+    email VARCHAR(255) NOT NULL,
+    password VARCHAR(255) NOT NULL
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE IF NOT EXISTS booking (
+    id INT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+    memberID INT NOT NULL,
+    attractionID INT NOT NULL,
+    date VARCHAR(20) NOT NULL,
+    time VARCHAR(20) NOT NULL,
+    price INT NOT NULL
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE IF NOT EXISTS ordersystem (
+    id INT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+    orderNum VARCHAR(32) NOT NULL,
+    memberId INT NOT NULL,
+    attractionId INT NOT NULL,
+    date VARCHAR(20) NOT NULL,
+    time VARCHAR(20) NOT NULL,
+    price INT NOT NULL,
+    email VARCHAR(255) NOT NULL,
+    name VARCHAR(255) NOT NULL,
+    phone VARCHAR(32) NOT NULL,
+    status VARCHAR(16) NOT NULL
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
@@ -0,0 +1,23 @@
+-- Indexes for every lookup the request path makes, and unique keys where the code already
+-- assumes at most one row. Adding a unique key fails if duplicates exist; remove them and
+-- run migrate.py again (indexes added before the failure are skipped on the re-run).
+
+-- ingest.py upserts attractions with ON DUPLICATE KEY UPDATE keyed by rownumber
+ALTER TABLE attractions ADD UNIQUE KEY uq_attractions_rownumber (rownumber);
+ALTER TABLE attractions ADD INDEX idx_attractions_mrt (mrt);
+
+-- Image lookups by attraction, and "first image" = lowest id for that attraction
+ALTER TABLE attractionImages ADD INDEX idx_attractionImages_rownumber (attractionRownumber, id);
+
+-- Sign-up checks the email before inserting; sign-in looks the member up by it
+ALTER TABLE membership ADD UNIQUE KEY uq_membership_email (email);
+
+-- One booking per member: POST /api/booking updates it or inserts it
+ALTER TABLE booking ADD UNIQUE KEY uq_booking_member (memberID);
+
+-- Order pages and the payment job look orders up by number. Not unique yet: the number is
+-- the order's creation time to the second, so two orders can share one
+ALTER TABLE ordersystem ADD INDEX idx_ordersystem_orderNum (orderNum);
+
+-- POST /api/order checks for the same trip already ordered under the same contact name
+ALTER TABLE ordersystem ADD INDEX idx_ordersystem_trip (name, date, time, attractionId);
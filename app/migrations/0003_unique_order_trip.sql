@@ -0,0 +1,6 @@
+-- POST /api/order now inserts and lets this key reject an identical order, instead of
+-- checking first. If orders placed twice in a race already exist, cancel the duplicates first.
+ALTER TABLE ordersystem ADD UNIQUE KEY uq_ordersystem_trip (name, date, time, attractionId);
+
+-- Covered by the unique key above
+ALTER TABLE ordersystem DROP INDEX idx_ordersystem_trip;
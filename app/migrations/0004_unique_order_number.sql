@@ -0,0 +1,6 @@
+-- Order numbers come from order_ids.py now and can no longer repeat. Orders placed in the same
+-- second under the old timestamp numbers share one; renumber those before applying this.
+ALTER TABLE ordersystem ADD UNIQUE KEY uq_ordersystem_orderNum (orderNum);
+
+-- Covered by the unique key above
+ALTER TABLE ordersystem DROP INDEX idx_ordersystem_orderNum;
@@ -0,0 +1,11 @@
+-- A declined order kept its row, and uq_ordersystem_trip then refused the same trip forever.
+-- tripActive is 1 while an order holds its trip and NULL once its payment fails. A unique key
+-- lets any number of rows share a NULL, so only orders still holding a trip can clash.
+ALTER TABLE ordersystem ADD COLUMN tripActive TINYINT NULL DEFAULT 1;
+
+UPDATE ordersystem SET tripActive = NULL WHERE status = 'failed';
+
+ALTER TABLE ordersystem ADD UNIQUE KEY uq_ordersystem_active_trip (name, date, time, attractionId, tripActive);
+
+-- Replaced by the key above
+ALTER TABLE ordersystem DROP INDEX uq_ordersystem_trip;
@@ -0,0 +1,2 @@
+-- payments.reconcile_pending looks for orders still Pending on a timer
+ALTER TABLE ordersystem ADD INDEX idx_ordersystem_status (status);
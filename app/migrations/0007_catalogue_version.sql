@@ -0,0 +1,7 @@
+-- Part of every worker's catalogue version stamp (catalogue.VERSION_QUERY). Row counts and max
+-- ids miss attractions updated in place, so ingest.py and POST /api/admin/catalogue/reload
+-- bump this counter whenever the catalogue changes or a reload is forced.
+CREATE TABLE IF NOT EXISTS catalogue_version (
+    id TINYINT NOT NULL PRIMARY KEY,
+    version BIGINT NOT NULL
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
@@ -0,0 +1,191 @@
+import os
+import time
+import fcntl
+import logging
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from database import get_pool
+from order_ids import created_at
+from workers import per_process
+
+logger = logging.getLogger(__name__)
+
+TAPPAY_URL = os.getenv("TAPPAY_URL", "https://sandbox.tappaysdk.com/tpc/payment/pay-by-prime")
+PARTNER_KEY = os.getenv("TAPPAY_PARTNER_KEY", 'partner_b0OKh6UYc94AT4ThSiORUeEoiBJBNIsMofJjaVZlzN2N9nmP7vwLvQ8q')
+MERCHANT_ID = os.getenv("TAPPAY_MERCHANT_ID", 'j22868706_TAISHIN')
+PAYMENT_WORKERS = int(os.getenv("PAYMENT_WORKERS", 4))
+PAYMENT_TIMEOUT = float(os.getenv("PAYMENT_TIMEOUT", 30))
+
+# Jobs live in their worker's thread pool, so a worker recycled or killed mid-payment leaves its
+# orders Pending. A sweep settles those from TapPay's trade records instead.
+TAPPAY_RECORD_URL = os.getenv("TAPPAY_RECORD_URL", "https://sandbox.tappaysdk.com/tpc/transaction/query")
+PAYMENT_RECONCILE_INTERVAL = float(os.getenv("PAYMENT_RECONCILE_INTERVAL", 60))
+# A prime expires 90 seconds after checkout, so a job that has not charged it by then never
+# will; past this age a Pending order has no job left that could still settle it
+PAYMENT_STALE_AFTER = float(os.getenv("PAYMENT_STALE_AFTER", 90 + 2 * PAYMENT_TIMEOUT))
+RECONCILE_LOCK = os.path.join(tempfile.gettempdir(), "taipeidaytrip-payment-reconcile.lock")
+# Trade record statuses: authorized or captured means the card was charged; pending, not yet
+RECORD_CHARGED = {0, 1}
+RECORD_PENDING = {4}
+
+@per_process
+def _resources():
+    executor = ThreadPoolExecutor(max_workers=PAYMENT_WORKERS, thread_name_prefix="payment")
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=PAYMENT_WORKERS)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return executor, session
+
+
+def pay_by_prime(order_num, prime, amount, contact_name, contact_email, contact_phone):
+    """Charge the card behind a TapPay prime; returns the gateway's JSON reply."""
+    _, session = _resources()
+    order_data = {
+        "prime": prime,
+        "partner_key": PARTNER_KEY,
+        "merchant_id": MERCHANT_ID,
+        "details": "TaiPei Day Trip Booking",
+        "amount": amount,
+        # Lets reconcile_pending find the charge if this worker dies before recording it
+        "order_number": order_num,
+        "cardholder": {
+            "phone_number": contact_phone,
+            "name": contact_name,
+            "email": contact_email,
+        },
+    }
+    headers = {
+        "Content-Type": "application/json",
+        "x-api-key": PARTNER_KEY,
+    }
+    req = session.post(TAPPAY_URL, headers=headers, json=order_data, timeout=PAYMENT_TIMEOUT)
+    return req.json()
+
+
+def process_payment(order_num, prime, amount, contact_name, contact_email, contact_phone):
+    """Background job: call the gateway and record the outcome on the Pending order.
+
+    Only TapPay's answer settles the order. A timeout, a dropped connection or an unreadable
+    reply may come after the card was charged, so the order stays Pending and
+    reconcile_pending settles it from TapPay's records once it is stale.
+    """
+    try:
+        result = pay_by_prime(order_num, prime, amount, contact_name, contact_email, contact_phone)
+    except Exception as e:
+        logger.error(f"Payment for order {order_num} got no answer, leaving it Pending: {e}")
+        return 'Pending'
+
+    code = result.get("status") if isinstance(result, dict) else None
+    if not isinstance(code, int):
+        logger.error(f"Payment for order {order_num} got an unreadable answer, leaving it Pending: {result!r}")
+        return 'Pending'
+    if code == 0:
+        status = 'confirm'
+    else:
+        status = 'failed'
+        logger.error(f"Payment for order {order_num} rejected: {result.get('msg')}")
+
+    record_status(order_num, status)
+    return status
+
+
+def record_status(order_num, status):
+    """Settle a Pending order; a failed one gives up its trip so the customer can order it again."""
+    # Runs outside any request, so check a connection out of the pool directly
+    try:
+        con = get_pool().acquire()
+        try:
+            cursor = con.cursor()
+            cursor.execute(
+                "UPDATE ordersystem SET status = %s, tripActive = %s WHERE orderNum = %s AND status = 'Pending'",
+                (status, 1 if status == 'confirm' else None, order_num),
+            )
+            con.commit()
+        finally:
+            con.close()
+    except Exception as e:
+        logger.error(f"Could not record payment status for order {order_num}: {e}")
+
+
+def submit_payment(order_num, prime, amount, contact_name, contact_email, contact_phone):
+    executor, _ = _resources()
+    return executor.submit(process_payment, order_num, prime, amount, contact_name, contact_email, contact_phone)
+
+
+def trade_status(order_num):
+    """'confirm' or 'failed' according to TapPay's records of the order, or None while it is undecided."""
+    _, session = _resources()
+    headers = {
+        "Content-Type": "application/json",
+        "x-api-key": PARTNER_KEY,
+    }
+    query = {"partner_key": PARTNER_KEY, "records_per_page": 10, "filters": {"order_number": order_num}}
+    reply = session.post(TAPPAY_RECORD_URL, headers=headers, json=query, timeout=PAYMENT_TIMEOUT).json()
+    # 0 answers with records, 2 with none
+    if reply.get("status") not in (0, 2):
+        raise RuntimeError(f"Record query failed: {reply.get('msg')}")
+    statuses = {record.get("record_status") for record in reply.get("trade_records") or ()}
+    if statuses & RECORD_CHARGED:
+        return 'confirm'
+    if statuses & RECORD_PENDING:
+        return None
+    # Declined, refunded, or the job never reached the gateway before its prime expired
+    return 'failed'
+
+
+def reconcile_pending(stale_after=PAYMENT_STALE_AFTER):
+    """Settle Pending orders older than stale_after seconds from TapPay's records; returns {order: status}."""
+    con = get_pool().acquire()
+    try:
+        cursor = con.cursor()
+        cursor.execute("SELECT orderNum FROM ordersystem WHERE status = 'Pending'")
+        pending = [row[0] for row in cursor.fetchall()]
+    finally:
+        con.close()
+
+    cutoff = time.time() - stale_after
+    settled = {}
+    for order_num in pending:
+        # Order numbers carry their creation time; the old timestamp numbers read as 2024, long stale
+        if created_at(order_num) > cutoff:
+            continue
+        try:
+            status = trade_status(order_num)
+        except Exception as e:
+            logger.error(f"Could not look up payment for order {order_num}: {e}")
+            continue
+        if status is not None:
+            logger.warning(f"Order {order_num} was left Pending; TapPay's records settle it as {status}")
+            record_status(order_num, status)
+            settled[order_num] = status
+    return settled
+
+
+def _reconcile_forever():
+    while True:
+        # One worker per host sweeps at a time; the others skip this round
+        with open(RECONCILE_LOCK, "a") as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                reconcile_pending()
+            except BlockingIOError:
+                pass
+            except Exception as e:
+                logger.error(f"Payment reconciliation failed: {e}")
+        time.sleep(PAYMENT_RECONCILE_INTERVAL)
+
+
+@per_process
+def start_reconciler():
+    """Sweep stale Pending orders now and every PAYMENT_RECONCILE_INTERVAL seconds (0 turns it off)."""
+    if PAYMENT_RECONCILE_INTERVAL <= 0:
+        return None
+    thread = threading.Thread(target=_reconcile_forever, name="payment-reconciler", daemon=True)
+    thread.start()
+    return thread
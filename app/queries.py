@@ -0,0 +1,62 @@
+"""Read queries shared by the booking, order and attraction routes.
+
+Each function takes a cursor from the request's pooled connection and answers with one round
+trip. An attraction's "first" image is the one with the lowest attractionImages.id, i.e. the
+first in the order ingest.py stored them.
+"""
+
+FIRST_IMAGE = (
+    "(SELECT i.imageUrl FROM attractionImages i WHERE i.attractionRownumber = a.rownumber "
+    "ORDER BY i.id LIMIT 1)"
+)
+
+BOOKING_QUERY = (
+    "SELECT b.attractionID, b.date, b.time, b.price, a.name, a.address, " + FIRST_IMAGE + " "
+    "FROM booking b JOIN attractions a ON a.id = b.attractionID "
+    "WHERE b.memberID = %s LIMIT 1"
+)
+
+ORDER_QUERY = (
+    "SELECT o.orderNum, o.attractionId, o.date, o.time, o.price, o.email, o.name, o.phone, o.status, "
+    "a.id, a.name, a.address, " + FIRST_IMAGE + " "
+    "FROM ordersystem o LEFT JOIN attractions a ON a.id = o.attractionId "
+    "WHERE o.orderNum = %s LIMIT 1"
+)
+
+
+def fetch_attractions(cursor):
+    """Every attraction row in id order, and every (rownumber, imageUrl) pair in image order."""
+    cursor.execute("SELECT * FROM attractions ORDER BY id")
+    rows = cursor.fetchall()
+    cursor.execute("SELECT attractionRownumber, imageUrl FROM attractionImages ORDER BY id")
+    return rows, cursor.fetchall()
+
+
+def fetch_booking(cursor, member_id):
+    """The member's booking with its attraction's name, address and first image, or None.
+
+    A booking whose attraction no longer exists counts as no booking.
+    """
+    cursor.execute(BOOKING_QUERY, (member_id,))
+    row = cursor.fetchone()
+    if not row:
+        return None
+    keys = ("attraction_id", "date", "time", "price", "attraction_name", "attraction_address", "attraction_image")
+    return dict(zip(keys, row))
+
+
+def fetch_order(cursor, order_number):
+    """The order with its attraction's name, address and first image joined in, or None.
+
+    attraction_found is False when the order points at an attraction that no longer exists.
+    """
+    # orderNum is a string column; an integer here would make MySQL convert every row and skip the index
+    cursor.execute(ORDER_QUERY, (str(order_number),))
+    row = cursor.fetchone()
+    if not row:
+        return None
+    keys = ("number", "attraction_id", "date", "time", "price", "email", "name", "phone", "status",
+            "attraction_found", "attraction_name", "attraction_address", "attraction_image")
+    order = dict(zip(keys, row))
+    order["attraction_found"] = order["attraction_found"] is not None
+    return order
@@ -0,0 +1,72 @@
+import unicodedata
+from collections import defaultdict
+
+# Searchable fields and the weight a match in each one adds to the score
+FIELDS = (("name", 4), ("mrt", 3), ("category", 2))
+GRAM_SIZE = 2
+
+
+def normalize(text):
+    return unicodedata.normalize("NFKC", text or "").casefold().strip()
+
+
+def grams(text, size=GRAM_SIZE):
+    if len(text) < size:
+        return {text} if text else set()
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+
+class SearchIndex:
+    """Character n-gram inverted index over attraction name, MRT and category.
+
+    Bigrams make substring lookups work the same for Chinese and English text; single
+    characters are indexed too so one-character keywords still hit the index.
+    """
+
+    def __init__(self, attractions):
+        self._attractions = attractions
+        self._fields = []
+        self._postings = defaultdict(set)
+        for position, attraction in enumerate(attractions):
+            fields = {field: normalize(attraction.get(field)) for field, _ in FIELDS}
+            self._fields.append(fields)
+            for text in fields.values():
+                for gram in grams(text) | set(text):
+                    self._postings[gram].add(position)
+
+    def search(self, keyword):
+        """Return attractions matching keyword, best match first and id order within a score."""
+        keyword = normalize(keyword)
+        if not keyword:
+            return list(self._attractions)
+
+        candidates = None
+        for gram in grams(keyword):
+            posting = self._postings.get(gram)
+            if not posting:
+                return []
+            candidates = set(posting) if candidates is None else candidates & posting
+            if not candidates:
+                return []
+
+        scored = []
+        for position in candidates:
+            score = self._score(self._fields[position], keyword)
+            if score:
+                scored.append((-score, position))
+        scored.sort()
+        return [self._attractions[position] for _, position in scored]
+
+    @staticmethod
+    def _score(fields, keyword):
+        # Grams only narrow the candidates down; the substring check decides the match
+        score = 0
+        for field, weight in FIELDS:
+            text = fields[field]
+            if text == keyword:
+                score += weight * 4
+            elif text.startswith(keyword):
+                score += weight * 2
+            elif keyword in text:
+                score += weight
+        return score
@@ -0,0 +1,115 @@
+import os
+import json
+
+from flask.json.provider import DefaultJSONProvider, _default
+from markupsafe import Markup
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# JSON_ENCODER=stdlib turns orjson off even when it is installed, e.g. to compare the two
+USE_ORJSON = orjson is not None and os.getenv("JSON_ENCODER", "auto") != "stdlib"
+
+COMPACT = (",", ":")
+ORJSON_OPTIONS = orjson.OPT_SORT_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS if orjson else 0
+
+
+class _FragmentFound(Exception):
+    """Raised from the encoder's default hook so the enclosing container is assembled by hand."""
+
+
+def _splicing_default(o):
+    if isinstance(o, Fragment):
+        raise _FragmentFound()
+    return _default(o)
+
+
+def _dumps(obj):
+    """Encode obj the way the API sends it: sorted keys, compact separators, raw UTF-8."""
+    if USE_ORJSON:
+        try:
+            return orjson.dumps(obj, default=_splicing_default, option=ORJSON_OPTIONS)
+        except TypeError as e:
+            # orjson swallows what the default hook raises, so recognise a fragment by its report
+            if isinstance(e.__cause__, _FragmentFound) or str(e).endswith(": Fragment"):
+                raise _FragmentFound() from None
+            # Non-str keys, integers over 64 bits, lone surrogates: json.dumps settles these
+    return json.dumps(obj, default=_splicing_default, ensure_ascii=False, sort_keys=True, separators=COMPACT).encode("utf-8")
+
+
+def encode(obj):
+    """Compact JSON bytes for obj, splicing in any Fragment verbatim instead of re-encoding it."""
+    if isinstance(obj, Fragment):
+        return obj.data
+    children = obj.values() if isinstance(obj, dict) else obj if isinstance(obj, (list, tuple)) else ()
+    if not any(isinstance(child, Fragment) for child in children):
+        try:
+            return _dumps(obj)
+        except _FragmentFound:
+            pass
+    # Only the containers on the way down to a fragment are assembled here
+    if isinstance(obj, dict) and all(isinstance(key, str) for key in obj):
+        return b"{" + b",".join(_dumps(key) + b":" + encode(obj[key]) for key in sorted(obj)) + b"}"
+    if isinstance(obj, (list, tuple)):
+        return b"[" + b",".join(encode(item) for item in obj) + b"]"
+    return json.dumps(obj, default=_default_unwrapping, ensure_ascii=False, sort_keys=True, separators=COMPACT).encode("utf-8")
+
+
+class Fragment:
+    """A value encoded once up front; responses containing it reuse the bytes.
+
+    Only the compact production form can splice the bytes. Other forms (debug indentation,
+    ASCII escaping) fall back to encoding `value` again.
+    """
+
+    __slots__ = ("value", "data")
+
+    def __init__(self, value):
+        self.value = value
+        self.data = encode(value)
+
+
+# What Jinja's tojson escapes, so the JSON can sit inside a <script> element
+_SCRIPT_ESCAPES = {ord("<"): "\\u003c", ord(">"): "\\u003e", ord("&"): "\\u0026", ord("'"): "\\u0027"}
+
+
+def script_json(obj):
+    """obj as JSON that is safe to place inside a <script> element, splicing Fragments like encode()."""
+    return Markup(encode(obj).decode("utf-8").translate(_SCRIPT_ESCAPES))
+
+
+def _default_unwrapping(o):
+    if isinstance(o, Fragment):
+        return o.value
+    return _default(o)
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask's JSON provider with a faster path for compact API responses.
+
+    When a response is encoded compactly with sorted keys and without ASCII escaping (the app's
+    production settings), dicts and lists are assembled from orjson output (stdlib json when orjson
+    is missing) and Fragments are spliced in as bytes. The result is byte-identical to json.dumps,
+    except that orjson writes floats outside 1e-4..1e16 as 1e16 rather than 1e+16; the API's
+    floats are coordinates and never get there. Anything else goes through json.dumps as before.
+    """
+
+    default = staticmethod(_default_unwrapping)
+
+    def dumps(self, obj, **kwargs):
+        if self._is_compact_api_form(kwargs):
+            return encode(obj).decode("utf-8")
+        return super().dumps(obj, **kwargs)
+
+    def _is_compact_api_form(self, kwargs):
+        if set(kwargs) != {"separators"} or tuple(kwargs["separators"]) != COMPACT:
+            return False
+        ensure_ascii = self._app.config["JSON_AS_ASCII"]
+        sort_keys = self._app.config["JSON_SORT_KEYS"]
+        if ensure_ascii is None:
+            ensure_ascii = self.ensure_ascii
+        if sort_keys is None:
+            sort_keys = self.sort_keys
+        return not ensure_ascii and sort_keys
@@ -5,14 +5,37 @@ let leftClicked = false;
 let rightClicked = false;
 
 
-function fetchAttractionData(attractionId) {
-  fetch(`/api/attraction/${attractionId}`)
+// The page route inlines the attraction's JSON; render it once the body is parsed
+function readInitialData() {
+  const element = document.getElementById("initial-data");
+  if (!element) {
+    return null;
+  }
+  try {
+    return JSON.parse(element.textContent);
+  } catch (error) {
+    return null;
+  }
+}
+
+function loadAttractionData(attractionId) {
+  const initialData = readInitialData();
+  if (initialData) {
+    return new Promise((resolve) => {
+      document.addEventListener("DOMContentLoaded", () => resolve(initialData));
+    });
+  }
+  return fetch(`/api/attraction/${attractionId}`)
     .then((response) => {
       if (!response.ok) {
         throw new Error('Network response was not ok');
       }
       return response.json();
-    })
+    });
+}
+
+function fetchAttractionData(attractionId) {
+  loadAttractionData(attractionId)
     .then((data) => {
       const attractionTitle = document.querySelector('.attraction-title');
       const attractionCategoryMRT = document.querySelector('.attraction-category-mrt');
@@ -35,7 +58,7 @@ function fetchAttractionData(attractionId) {
         
         attractionImages.forEach((imageUrl, index) => {
           const imgElement = document.createElement('img');
-          imgElement.src = imageUrl;
+          imgElement.src = `/img/${data.data.id}/${index}?w=1280`;
           imgElement.alt = data.data.name;
           imgElement.classList.add('attraction-image');
           
@@ -415,10 +415,15 @@ function loginBlock() {
     .then(response => response.json())
     .then(data => {
         console.log(data);
+        if (data.error) {
+          window.alert(data.message);
+          return;
+        }
         const orderNumber = data.data.number
+        // The booking stays until the payment is confirmed, so a declined card can be retried
+        sessionStorage.setItem("pendingOrder", orderNumber);
         const redirectURL = `/thankyou?number=${orderNumber}`;
         window.location.href = redirectURL;
-        deleteBooking() 
     })
     .catch(error => {
         console.error('錯誤:', error);
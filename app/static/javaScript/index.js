@@ -1,6 +1,26 @@
+// Inlined by the page route; each part is used once, for the first load
+const initialData = readInitialData();
+
+function readInitialData() {
+  const element = document.getElementById("initial-data");
+  if (!element) {
+    return {};
+  }
+  try {
+    return JSON.parse(element.textContent);
+  } catch (error) {
+    return {};
+  }
+}
+
+function takeInitialData(name) {
+  const data = initialData[name];
+  delete initialData[name];
+  return data ? Promise.resolve(data) : null;
+}
+
 function fetchMrts() {
-    fetch('/api/mrts')
-      .then((response) => response.json())
+    (takeInitialData("mrts") || fetch('/api/mrts').then((response) => response.json()))
       .then((data) => {
         const ul = document.getElementById('mrt-stations');
         
@@ -22,9 +42,7 @@ function fetchMrts() {
         console.error('無法顯示：', error);
       });
   }
-  window.onload = fetchMrts;
-  
-  fetchMrts();
+  document.addEventListener("DOMContentLoaded", fetchMrts);
   
   function leftScroll() {
     const listContent = document.getElementById('mrt-stations');
@@ -43,16 +61,16 @@ function fetchMrts() {
       const searchButton = document.getElementById("search-button");
       const searchInput = document.getElementById("search-input");
       const attractionsContainer = document.getElementById("attractions-container");
-      let nextPage = 0;
+      let nextCursor = "";
       let isLoading = false;
       let keyword = "";
   
       function loadMoreData() {
-        if (nextPage !== null && !isLoading) {
+        if (nextCursor !== null && !isLoading) {
           isLoading = true;
+          const initialPage = keyword === "" && nextCursor === "" ? takeInitialData("attractions") : null;
       
-          fetch(`/api/attractions?keyword=${keyword}&page=${nextPage}`)
-            .then((response) => response.json())
+          (initialPage || fetch(`/api/attractions?keyword=${encodeURIComponent(keyword)}&cursor=${nextCursor}`).then((response) => response.json()))
             .then((data) => {
               console.log(data)
               if (data.data && data.data.length > 0) {
@@ -60,14 +78,14 @@ function fetchMrts() {
                   appendDataToPage(attraction);
                 });
       
-                nextPage = data.nextPage;
+                nextCursor = data.nextCursor;
       
                 isLoading = false;
               } else if (data === null || data.data === null) {
                   window.alert("查無景點");
                   isLoading = false;
               } else {
-                nextPage = null;
+                nextCursor = null;
               }
             })
             .catch((error) => {
@@ -79,7 +97,7 @@ function fetchMrts() {
       
   function initializePage() {
     attractionsContainer.innerHTML = "";
-    nextPage = 0;
+    nextCursor = "";
     keyword = searchInput.value;
   
     setupScrollListener();
@@ -91,7 +109,7 @@ function fetchMrts() {
       if (
         window.innerHeight + window.scrollY >=
           document.documentElement.scrollHeight - 100 &&
-        nextPage !== null &&
+        nextCursor !== null &&
         !isLoading
       ) {
         loadMoreData();
@@ -110,7 +128,8 @@ function fetchMrts() {
     
       if (attraction.images && attraction.images.length > 0) {
       const imgElement = document.createElement("img");
-      imgElement.src = attraction.images[0];
+      // Cards are about 300px wide; the proxy serves a cached 640px copy instead of the full-size original
+      imgElement.src = `/img/${attraction.id}/0?w=640`;
       imgElement.alt = attraction.name;
       imgElement.classList.add("attraction-img");
       attractionDiv.appendChild(imgElement);
@@ -139,10 +158,9 @@ function fetchMrts() {
   
   }
   
-  window.onload = function () {
-    initializePage();
-    setupScrollListener(); 
-  }
+  // No need to wait for window.onload: the first page is usually inlined already
+  initializePage();
+  setupScrollListener(); 
   
   searchButton.addEventListener("click", initializePage);
     });
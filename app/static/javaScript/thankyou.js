@@ -157,6 +157,11 @@ function submitSigninForm(signinEvent) {
     window.location.href = `/`;
   }
   
+  // Payment runs in the background after /api/order answers; poll until it settles
+  const PAYMENT_POLL_INTERVAL = 1000;
+  const PAYMENT_POLL_LIMIT = 60;
+  let paymentPolls = 0;
+
   function fetchNumber(){
     let urlParams = new URLSearchParams(window.location.search);
     let orderNumber = urlParams.get('number');
@@ -191,12 +196,39 @@ function submitSigninForm(signinEvent) {
           touristPhone.textContent = data.data.contact.phone;
           touristEmail.textContent = data.data.contact.email;
           attractionImg.src = data.data.trip.attraction.image;
+          if (data.data.status === "Pending" && paymentPolls < PAYMENT_POLL_LIMIT) {
+            paymentPolls += 1;
+            setTimeout(fetchNumber, PAYMENT_POLL_INTERVAL);
+          } else if (data.data.status === "Pending") {
+            // The server settles it from the gateway's records within a few minutes
+            window.alert("付款仍在確認中，請稍後重新整理此頁面查看結果");
+          } else if (data.data.status === "confirm") {
+            clearPaidBooking(orderNumber);
+          } else if (data.data.status === "failed") {
+            sessionStorage.removeItem("pendingOrder");
+            window.alert("付款失敗，請重新付款");
+            window.location.href = "/booking";
+          }
         } 
     }).catch(error => {
         console.log(error);
     })
   }
   fetchNumber()
+
+  // Only for the order placed from this tab, so revisiting an old order never deletes a newer booking
+  function clearPaidBooking(orderNumber) {
+    if (sessionStorage.getItem("pendingOrder") !== orderNumber) {
+      return;
+    }
+    sessionStorage.removeItem("pendingOrder");
+    fetch("/api/booking", {
+      method: "DELETE",
+      headers: { Authorization: `Bearer ${localStorage.getItem("token")}` },
+    }).catch((error) => {
+      console.error("刪除預定失敗:", error);
+    });
+  }
   
   function bookingButton(){
     const token = localStorage.getItem("token");
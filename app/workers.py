@@ -0,0 +1,57 @@
+"""Helpers for code that runs in every gunicorn worker at once.
+
+- per_process: a value built once in each process. Threads, sockets, flocks and memory maps
+  do not survive fork, or end up shared with the parent, so a forked worker must never reuse
+  what was built before the fork.
+- write_atomic: replace a file so that a reader in another worker sees the old or the new
+  contents, never half of them.
+"""
+import os
+import functools
+import threading
+
+
+class per_process:
+    """Decorator: the function builds its value on the first call in each process, later calls return it.
+
+        @per_process
+        def get_pool():
+            return ConnectionPool(...)
+    """
+
+    def __init__(self, factory):
+        functools.update_wrapper(self, factory)
+        self._factory = factory
+        self._value = None
+        self._pid = None
+        self._lock = threading.Lock()
+        # A thread in the parent may hold the lock at the moment of fork; the child must not inherit that
+        os.register_at_fork(after_in_child=self._reset_lock)
+
+    def _reset_lock(self):
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        pid = os.getpid()
+        if self._pid != pid:
+            with self._lock:
+                if self._pid != pid:
+                    self._value = self._factory()
+                    self._pid = pid
+        return self._value
+
+    def set(self, value):
+        """Use `value` in this process instead of building one."""
+        with self._lock:
+            self._value = value
+            self._pid = os.getpid()
+
+
+def write_atomic(path, data):
+    """Write bytes to `path` through a temporary file and a rename, creating its directory if needed."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Unique per process and thread, so concurrent writers of one path never share a temp file
+    temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temp_path, "wb") as file:
+        file.write(data)
+    os.replace(temp_path, path)
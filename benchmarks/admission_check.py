@@ -0,0 +1,181 @@
+"""Offline checks for admission control (app/admission.py).
+
+Boots the app in-process on the SQLite stand-in with admission control on and checks that:
+- a client past its browse bucket gets fast 429s with Retry-After, while another client and
+  a spoofed X-Forwarded-For entry change nothing;
+- X-Forwarded-For is ignored on requests that do not come from the proxy's address;
+- processes sharing the bucket file admit no more than one bucket's worth between them;
+- with slow image downloads filling the worker, images get 503 with Retry-After while
+  browsing and checkout are still admitted;
+- at every in-flight level, checkout is admitted whenever any other class is.
+
+    python benchmarks/admission_check.py --max-in-flight 8
+"""
+import os
+import sys
+import json
+import time
+import sqlite3
+import logging
+import argparse
+import tempfile
+import threading
+import statistics
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+import standin
+import fake_origin
+
+
+def take_all(path, key, attempts):
+    """Spend tokens from one shared bucket in a fresh process; returns how many were granted."""
+    import admission
+
+    buckets = admission.SharedBuckets(path)
+    return sum(1 for _ in range(attempts) if buckets.take(key, rate=0.001, burst=100) == 0)
+
+
+def check_shared(work_dir, processes=4):
+    path = os.path.join(work_dir, "shared-buckets")
+    with multiprocessing.get_context("spawn").Pool(processes) as pool:
+        granted = pool.starmap(take_all, [(path, "browse:198.51.100.7", 100)] * processes)
+    return {"processes": processes, "burst": 100, "granted": granted, "ok": sum(granted) == 100}
+
+
+def check_rate_limit(base_url, rate, burst):
+    session = requests.Session()
+    url = f"{base_url}/api/attractions?keyword=&cursor="
+    statuses = []
+    rejected_ms = []
+    retry_after = set()
+    began = time.perf_counter()
+    for _ in range(int(burst) + 20):
+        started = time.perf_counter()
+        reply = session.get(url, headers={"X-Forwarded-For": "203.0.113.1"})
+        if reply.status_code == 429:
+            rejected_ms.append((time.perf_counter() - started) * 1000)
+            retry_after.add(reply.headers.get("Retry-After"))
+        statuses.append(reply.status_code)
+    # Tokens refilled while the loop ran are admitted too
+    allowance = burst + rate * (time.perf_counter() - began)
+    spoofed = session.get(url, headers={"X-Forwarded-For": "10.9.9.9, 203.0.113.1"}).status_code
+    other = session.get(url, headers={"X-Forwarded-For": "203.0.113.2"}).status_code
+    return {
+        "admitted": statuses.count(200),
+        "rejected": statuses.count(429),
+        "retry_after": sorted(retry_after),
+        "rejected_p50_ms": round(statistics.median(rejected_ms), 2) if rejected_ms else None,
+        "spoofed_forwarded_for": spoofed,
+        "other_client": other,
+        "ok": burst <= statuses.count(200) <= allowance and statuses.count(429) > 0 and spoofed == 429 and other == 200,
+    }
+
+
+def check_untrusted_peer(app):
+    import admission
+
+    def address(peer):
+        with app.test_request_context("/api/attractions", headers={"X-Forwarded-For": "198.51.100.99"}, environ_base={"REMOTE_ADDR": peer}):
+            return admission.client_address()
+
+    direct, proxied = address("203.0.113.50"), address("127.0.0.1")
+    return {"direct_client": direct, "proxied_client": proxied, "ok": direct == "203.0.113.50" and proxied == "198.51.100.99"}
+
+
+def check_shedding(base_url, cards, max_in_flight):
+    image_slots = int(max_in_flight * 0.5)
+    urls = [f"{base_url}/img/{card['id']}/0?w=320" for card in cards[:max_in_flight]]
+
+    def fetch(i_url):
+        i, url = i_url
+        reply = requests.get(url, headers={"X-Forwarded-For": f"198.51.100.{i + 1}"})
+        return reply.status_code, reply.headers.get("Retry-After")
+
+    with ThreadPoolExecutor(max_workers=len(urls)) as executor:
+        images = executor.map(fetch, enumerate(urls))
+        # Give the admitted downloads time to start and hold their slots
+        time.sleep(0.3)
+        browse = requests.get(f"{base_url}/api/attractions?cursor=", headers={"X-Forwarded-For": "192.0.2.1"}).status_code
+        checkout = requests.get(f"{base_url}/api/booking", headers={"X-Forwarded-For": "192.0.2.2"}).status_code
+        images = list(images)
+    statuses = [status for status, _ in images]
+    return {
+        "image_requests": len(urls),
+        "images_admitted": statuses.count(200),
+        "images_shed": statuses.count(503),
+        "shed_retry_after": sorted({retry for status, retry in images if status == 503}),
+        "browse_while_loaded": browse,
+        "checkout_while_loaded": checkout,
+        "ok": statuses.count(200) == image_slots and statuses.count(503) == len(urls) - image_slots
+        and browse == 200 and checkout != 503,
+    }
+
+
+def check_priority(app, max_in_flight):
+    import admission
+
+    paths = {"images": "/img/1/0", "browse": "/api/attractions", "pages": "/", "auth": "/api/user/auth", "checkout": "/api/order"}
+    admitted = {}
+    for level in range(max_in_flight + 1):
+        admission._in_flight = level
+        admitted[level] = []
+        for name, path in paths.items():
+            with app.test_request_context(path, headers={"X-Forwarded-For": f"192.0.2.{level + 10}"}):
+                response = admission._admit()
+                admission._release()
+            if response is None:
+                admitted[level].append(name)
+    admission._in_flight = 0
+    ok = all(("checkout" in names) or not names for names in admitted.values()) and "checkout" not in admitted[max_in_flight]
+    return {"admitted_by_in_flight": admitted, "ok": ok}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--max-in-flight", type=int, default=8)
+    parser.add_argument("--latency-ms", type=float, default=1500, help="simulated image host latency that holds requests in flight")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp()
+    os.environ["ADMISSION_CONTROL"] = "on"
+    os.environ["ADMISSION_DIR"] = os.path.join(work_dir, "admission")
+    os.environ["ADMISSION_MAX_IN_FLIGHT"] = str(args.max_in_flight)
+    os.environ["IMAGE_CACHE_DIR"] = os.path.join(work_dir, "images")
+    _, origin_url = fake_origin.start(latency=args.latency_ms / 1000)
+
+    path = standin.create_database(os.path.join(work_dir, "admission.sqlite3"))
+    con = sqlite3.connect(path)
+    con.execute("UPDATE attractionImages SET imageUrl = ? || '/' || attractionRownumber || '-' || id || '.jpg'", (origin_url,))
+    con.commit()
+    con.close()
+    standin.install(path, standin.QueryCounter())
+
+    from werkzeug.serving import make_server
+    import app as app_module
+    import admission
+
+    logging.getLogger().setLevel(logging.WARNING)
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    server = make_server("127.0.0.1", 0, app_module.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+
+    cards = requests.get(f"{base_url}/api/attractions?page=0", headers={"X-Forwarded-For": "192.0.2.250"}).json()["data"]
+    results = {
+        "rate_limit": check_rate_limit(base_url, *admission.LIMITS["browse"][:2]),
+        "shared_buckets": check_shared(work_dir),
+        "untrusted_peer": check_untrusted_peer(app_module.app),
+        "shedding": check_shedding(base_url, cards, args.max_in_flight),
+        "priority": check_priority(app_module.app, args.max_in_flight),
+    }
+    server.shutdown()
+
+    print(json.dumps(results, indent=2))
+    return 0 if all(result["ok"] for result in results.values()) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,126 @@
+"""Offline benchmark and checks for the /img image proxy.
+
+Points the stand-in's attractionImages at a local fake origin (fake_origin.py, with a
+simulated remote latency), boots the app in-process with a fresh cache directory and loads
+the first index page's card images three ways: straight from the origin, through the proxy
+cold, and through the proxy warm. It then checks that:
+- simultaneous requests for one uncached image fetch the original once;
+- every original was fetched once in total;
+- a cache over its byte budget is swept back under it, keeping the most recently used files.
+
+    python benchmarks/bench_image_proxy.py --latency-ms 150 --width 640
+"""
+import os
+import sys
+import json
+import time
+import sqlite3
+import logging
+import argparse
+import tempfile
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+import standin
+import fake_origin
+
+CARDS = 12
+
+
+def load_all(urls, concurrency=6):
+    """Fetch urls like a browser would (six at a time); returns (seconds, bytes, statuses)."""
+    session = requests.Session()
+
+    def fetch(url):
+        reply = session.get(url)
+        return reply.status_code, len(reply.content)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        replies = list(executor.map(fetch, urls))
+    return time.perf_counter() - started, sum(size for _, size in replies), [status for status, _ in replies]
+
+
+def check_eviction(origin_url, work_dir):
+    import images
+
+    cache = images.ImageCache(os.path.join(work_dir, "eviction"), max_bytes=10 ** 12)
+    digests = [cache.original(f"{origin_url}/evict-{i}.jpg")[0] for i in range(8)]
+    for i, digest in enumerate(digests):
+        # Oldest access first, a second apart
+        os.utime(cache.original_path(digest), (1_000_000 + i, 1_000_000 + i))
+    size = os.path.getsize(cache.original_path(digests[0]))
+    cache.max_bytes = int(size * 3.5)
+    cache.sweep()
+    kept = [os.path.exists(cache.original_path(digest)) for digest in digests]
+    total = sum(os.path.getsize(cache.original_path(d)) for d, k in zip(digests, kept) if k)
+    return {"budget_bytes": cache.max_bytes, "bytes_after_sweep": total, "kept": kept,
+            "ok": total <= cache.max_bytes and kept == sorted(kept) and any(kept)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latency-ms", type=float, default=150, help="simulated remote image host latency")
+    parser.add_argument("--width", type=int, default=640)
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp()
+    os.environ["IMAGE_CACHE_DIR"] = os.path.join(work_dir, "cache")
+    _, origin_url = fake_origin.start(latency=args.latency_ms / 1000)
+
+    path = standin.create_database(os.path.join(work_dir, "images.sqlite3"))
+    con = sqlite3.connect(path)
+    con.execute("UPDATE attractionImages SET imageUrl = ? || '/' || attractionRownumber || '-' || id || '.jpg'", (origin_url,))
+    con.commit()
+    con.close()
+    standin.install(path, standin.QueryCounter())
+
+    from werkzeug.serving import make_server
+    import app as app_module
+    import images
+
+    logging.getLogger().setLevel(logging.WARNING)
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    server = make_server("127.0.0.1", 0, app_module.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+
+    cards = requests.get(f"{base_url}/api/attractions?page=0").json()["data"][:CARDS]
+    direct = [card["images"][0] for card in cards]
+    proxied = [f"{base_url}/img/{card['id']}/0?w={args.width}" for card in cards]
+
+    # The fake origin makes each image on first request; do that before anything is timed
+    load_all(direct)
+
+    results = {"pillow": images.Image is not None}
+    hits = fake_origin.FakeOriginHandler.hits
+    before = None
+    for name, urls in (("origin_direct", direct), ("proxy_cold", proxied), ("proxy_warm", proxied)):
+        seconds, size, statuses = load_all(urls)
+        results[name] = {"page_ms": round(seconds * 1000, 1), "kb_per_image": round(size / len(urls) / 1024, 1), "statuses": sorted(set(statuses))}
+        if before is None:
+            before = Counter(hits)
+
+    fetches_before = images.cache.fetches
+    uncached = [f"{base_url}/img/{cards[-1]['id'] + 1}/0?w={args.width}"] * 16
+    load_all(uncached, concurrency=len(uncached))
+    results["simultaneous_misses"] = {"requests": len(uncached), "origin_fetches": images.cache.fetches - fetches_before}
+    results["origin_fetches_per_original"] = max((Counter(hits) - before).values())
+    results["eviction"] = check_eviction(origin_url, work_dir)
+    server.shutdown()
+
+    print(json.dumps(results, indent=2))
+    ok = (
+        results["simultaneous_misses"]["origin_fetches"] == 1
+        and results["origin_fetches_per_original"] == 1
+        and results["eviction"]["ok"]
+        and all(results[name]["statuses"] == [200] for name in ("origin_direct", "proxy_cold", "proxy_warm"))
+    )
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,105 @@
+"""Before/after benchmark for loading the images of an /api/attractions page.
+
+"before" replays the old pattern (one SELECT per attraction), "after" loads them all with
+one IN query. The app now loads every image up front (queries.fetch_attractions), so this
+measures the batching step on its own. Both run against the SQLite stand-in with an
+optional simulated network round trip per statement.
+
+    python benchmarks/bench_images.py --rtt-ms 0.5 --iterations 200
+"""
+import os
+import json
+import time
+import argparse
+import tempfile
+import statistics
+
+import standin
+
+PAGE_SIZE = 12
+
+
+def load_page(cursor, page):
+    cursor.execute("SELECT * FROM attractions ORDER BY id LIMIT %s, %s", (page * PAGE_SIZE, PAGE_SIZE))
+    return cursor.fetchall()
+
+
+def images_one_by_one(cursor, rows):
+    images = {}
+    for row in rows:
+        cursor.execute("SELECT imageUrl FROM attractionImages WHERE attractionRownumber = %s", (row[1],))
+        images[row[1]] = [img[0] for img in cursor.fetchall()]
+    return images
+
+
+def fetch_images(cursor, rownumbers):
+    """Load the image URLs of many attractions with a single query, keyed by rownumber."""
+    images = {rownumber: [] for rownumber in rownumbers}
+    if not images:
+        return images
+
+    # The two tables may not agree on the rownumber column type, so match on its text form
+    by_key = {str(rownumber): urls for rownumber, urls in images.items()}
+    placeholders = ", ".join(["%s"] * len(by_key))
+    img_query = f"SELECT attractionRownumber, imageUrl FROM attractionImages WHERE attractionRownumber IN ({placeholders}) ORDER BY id"
+    cursor.execute(img_query, list(by_key))
+    for rownumber, image_url in cursor.fetchall():
+        urls = by_key.get(str(rownumber))
+        if urls is not None:
+            urls.append(image_url)
+    return images
+
+
+def images_batched(cursor, rows):
+    return fetch_images(cursor, [row[1] for row in rows])
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def run(loader, connection, counter, pages, iterations):
+    timings = []
+    round_trips = []
+    for i in range(iterations):
+        page = i % pages
+        cursor = connection.cursor()
+        counter.reset()
+        start = time.perf_counter()
+        rows = load_page(cursor, page)
+        loader(cursor, rows)
+        timings.append((time.perf_counter() - start) * 1000)
+        round_trips.append(counter.reset())
+    return {
+        "round_trips_per_page": statistics.mean(round_trips),
+        "p50_ms": round(percentile(timings, 50), 3),
+        "p99_ms": round(percentile(timings, 99), 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rtt-ms", type=float, default=0.5, help="simulated database round trip per statement")
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    path = standin.create_database(os.path.join(tempfile.mkdtemp(), "bench.sqlite3"))
+    counter = standin.QueryCounter()
+    connection = standin.StandInConnection(path, counter, rtt=args.rtt_ms / 1000)
+    pages = 5  # 58 attractions -> pages 0..4
+
+    before = run(images_one_by_one, connection, counter, pages, args.iterations)
+    after = run(images_batched, connection, counter, pages, args.iterations)
+
+    # Both loaders must agree before the numbers mean anything
+    cursor = connection.cursor()
+    rows = load_page(cursor, 0)
+    assert images_one_by_one(cursor, rows) == images_batched(cursor, rows)
+
+    print(json.dumps({"rtt_ms": args.rtt_ms, "before": before, "after": after}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Before/after benchmark for encoding /api/attractions pages.
+
+"stdlib" is what jsonify did before: json.dumps over the page's attraction dicts with sorted
+keys, compact separators and raw UTF-8. "orjson" encodes the same objects with orjson (when it
+is installed). "fragments" splices each attraction's pre-encoded bytes from the catalogue, which
+is what the API does now. All three must produce identical bytes.
+
+    python benchmarks/bench_json.py --iterations 2000 --scale 4
+"""
+import os
+import json
+import time
+import argparse
+import tempfile
+import statistics
+
+import standin
+import serialization
+from catalogue import CatalogueSnapshot
+from queries import fetch_attractions
+
+PAGE_SIZE = 12
+
+
+def stdlib_page(snapshot, page):
+    body = {"data": snapshot.attractions[page * PAGE_SIZE:(page + 1) * PAGE_SIZE], "nextPage": page + 1}
+    return json.dumps(body, ensure_ascii=False, sort_keys=True, separators=(",", ":")).encode("utf-8")
+
+
+def orjson_page(snapshot, page):
+    body = {"data": snapshot.attractions[page * PAGE_SIZE:(page + 1) * PAGE_SIZE], "nextPage": page + 1}
+    return serialization.encode(body)
+
+
+def fragments_page(snapshot, page):
+    attractions = snapshot.attractions[page * PAGE_SIZE:(page + 1) * PAGE_SIZE]
+    body = {"data": [snapshot.fragments[attraction["id"]] for attraction in attractions], "nextPage": page + 1}
+    return serialization.encode(body)
+
+
+def run(encoder, snapshot, pages, iterations):
+    timings = []
+    for i in range(iterations):
+        start = time.perf_counter()
+        encoder(snapshot, i % pages)
+        timings.append((time.perf_counter() - start) * 1_000_000)
+    return {
+        "mean_us": round(statistics.mean(timings), 1),
+        "p50_us": round(sorted(timings)[len(timings) // 2], 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--scale", type=int, default=1, help="repeat the 58-row catalogue this many times")
+    args = parser.parse_args()
+
+    path = standin.create_database(os.path.join(tempfile.mkdtemp(), "bench.sqlite3"), scale=args.scale)
+    connection = standin.StandInConnection(path, standin.QueryCounter())
+    rows, image_rows = fetch_attractions(connection.cursor())
+    snapshot = CatalogueSnapshot(rows, image_rows, version=None)
+    pages = len(snapshot.attractions) // PAGE_SIZE
+
+    # The faster encoders are only worth anything if they send the same bytes
+    for page in range(pages):
+        assert stdlib_page(snapshot, page) == orjson_page(snapshot, page) == fragments_page(snapshot, page)
+
+    results = {"orjson_installed": serialization.orjson is not None, "stdlib": run(stdlib_page, snapshot, pages, args.iterations)}
+    if serialization.USE_ORJSON:
+        results["orjson"] = run(orjson_page, snapshot, pages, args.iterations)
+    results["fragments"] = run(fragments_page, snapshot, pages, args.iterations)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""Benchmark for /api/attractions/nearby's KD-tree index against a linear scan.
+
+Scatters --points synthetic attractions over Taipei (seeded, so runs compare), builds the
+GeoIndex the catalogue builds, then times k-nearest and radius queries from random points in
+Taipei and from anywhere on the globe. Every answer is checked against a brute-force
+haversine scan over a sample of the queries. Exits 1 if any case's p50 is over --budget-us.
+
+    python benchmarks/bench_nearby.py --points 100000 --queries 2000
+"""
+import sys
+import json
+import time
+import random
+import argparse
+import statistics
+
+import standin  # noqa: F401  (puts app/ on sys.path)
+from geo import GeoIndex, haversine
+
+# Roughly the area the real catalogue covers
+LAT_RANGE = (24.95, 25.25)
+LNG_RANGE = (121.40, 121.65)
+
+
+def brute_force(points, lat, lng, limit, radius=None):
+    distances = sorted((haversine(lat, lng, point["lat"], point["lng"]), point["id"]) for point in points)
+    if radius is not None:
+        distances = [entry for entry in distances if entry[0] <= radius]
+    return [attraction_id for _, attraction_id in distances[:limit]]
+
+
+def timed(call, queries):
+    timings = []
+    for query in queries:
+        start = time.perf_counter()
+        call(*query)
+        timings.append((time.perf_counter() - start) * 1_000_000)
+    ordered = sorted(timings)
+    return {
+        "mean_us": round(statistics.mean(timings), 1),
+        "p50_us": round(ordered[len(ordered) // 2], 1),
+        "p99_us": round(ordered[int(len(ordered) * 0.99)], 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--points", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--verify", type=int, default=50, help="queries checked against a linear scan")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--budget-us", type=float, default=1000, help="p50 latency every case must stay under")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    points = [
+        {"id": i, "lat": rng.uniform(*LAT_RANGE), "lng": rng.uniform(*LNG_RANGE)}
+        for i in range(1, args.points + 1)
+    ]
+    started = time.perf_counter()
+    index = GeoIndex(points)
+    build_ms = (time.perf_counter() - started) * 1000
+    origins = [(rng.uniform(*LAT_RANGE), rng.uniform(*LNG_RANGE)) for _ in range(args.queries)]
+
+    cases = {
+        "knn_12": [(lat, lng, 12, None) for lat, lng in origins],
+        "knn_50": [(lat, lng, 50, None) for lat, lng in origins],
+        "radius_500m_limit_50": [(lat, lng, 50, 500) for lat, lng in origins],
+    }
+    # Far from every attraction, e.g. ?lat=0&lng=0 on the public route
+    anywhere = [(rng.uniform(-90, 90), rng.uniform(-180, 180)) for _ in range(max(1, args.queries // 4))]
+    cases["knn_12_anywhere"] = [(lat, lng, 12, None) for lat, lng in anywhere]
+    cases["knn_50_anywhere"] = [(lat, lng, 50, None) for lat, lng in anywhere]
+    cases["radius_2km_anywhere"] = [(lat, lng, 12, 2000) for lat, lng in anywhere]
+    for name, queries in cases.items():
+        for lat, lng, limit, radius in queries[:args.verify]:
+            found = [attraction["id"] for _, attraction in index.nearest(lat, lng, limit, radius=radius)]
+            assert found == brute_force(points, lat, lng, limit, radius), (name, lat, lng)
+
+    results = {"points": args.points, "build_ms": round(build_ms, 1)}
+    over_budget = []
+    for name, queries in cases.items():
+        results[name] = timed(lambda lat, lng, limit, radius: index.nearest(lat, lng, limit, radius=radius), queries)
+        if results[name]["p50_us"] > args.budget_us:
+            over_budget.append(name)
+    scan_queries = cases["knn_12"][:max(1, min(20, args.queries))]
+    results["linear_scan_knn_12"] = timed(lambda lat, lng, limit, radius: brute_force(points, lat, lng, limit), scan_queries)
+    results["over_budget"] = over_budget
+    print(json.dumps(results, indent=2))
+    return 1 if over_budget else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
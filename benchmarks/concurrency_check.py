@@ -0,0 +1,152 @@
+"""Fire simultaneous booking and order requests for one member and check the rows they leave.
+
+Each round releases --concurrency threads at once, all as the same member:
+- bookings: every thread POSTs /api/booking with a different trip. All must answer 200, and
+  the member must end with exactly one booking row, equal to one of the trips sent.
+- orders: every thread POSTs the identical order. Exactly one must answer 202 and the rest 400,
+  with exactly one ordersystem row for that trip.
+
+After the rounds, one order is declined. Ordering the same trip again must then succeed once.
+
+The app runs in-process on the SQLite stand-in with a simulated round trip per statement,
+which widens any window between a check and a write. Exits 1 if any round fails.
+
+    python benchmarks/concurrency_check.py --concurrency 32 --rounds 10 --rtt-ms 2
+"""
+import os
+import sys
+import json
+import time
+import sqlite3
+import logging
+import argparse
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import standin
+import fake_tappay
+from run import Client
+
+
+def burst(concurrency, send):
+    """Call send(i) from `concurrency` threads released together; returns (responses, seconds)."""
+    barrier = threading.Barrier(concurrency)
+
+    def fire(i):
+        barrier.wait()
+        return send(i)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        responses = list(executor.map(fire, range(concurrency)))
+    return responses, time.perf_counter() - started
+
+
+def booking_round(client, db, member_id, concurrency, round_number):
+    trips = [
+        {"attractionId": 1 + i % 58, "date": f"2030-01-{1 + round_number % 28:02d}", "time": "morning", "price": 2000 + i}
+        for i in range(concurrency)
+    ]
+    responses, seconds = burst(concurrency, lambda i: client.request("POST", "/api/booking", auth=True, json=trips[i]))
+    rows = db.execute("SELECT attractionID, date, time, price FROM booking WHERE memberID = ?", (member_id,)).fetchall()
+    sent = {(trip["attractionId"], trip["date"], trip["time"], trip["price"]) for trip in trips}
+    failures = []
+    statuses = sorted(response.status_code for response in responses)
+    if any(status != 200 for status in statuses):
+        failures.append(f"statuses {statuses}")
+    if len(rows) != 1:
+        failures.append(f"{len(rows)} booking rows")
+    elif tuple(rows[0]) not in sent:
+        failures.append(f"stored booking {tuple(rows[0])} was never sent")
+    return failures, seconds
+
+
+def order_round(client, db, concurrency, round_number):
+    body = client.order_body()
+    contact = body["order"]["contact"]["name"]
+    responses, seconds = burst(concurrency, lambda i: client.request("POST", "/api/order", auth=True, json=body))
+    count = db.execute("SELECT COUNT(*) FROM ordersystem WHERE name = ?", (contact,)).fetchone()[0]
+    statuses = sorted(response.status_code for response in responses)
+    failures = []
+    if statuses != [202] + [400] * (concurrency - 1):
+        failures.append(f"statuses {statuses}")
+    if count != 1:
+        failures.append(f"{count} order rows")
+    return failures, seconds
+
+
+def retry_after_decline(client, timeout=10):
+    """A declined order must release its trip: the same order then goes through, once."""
+    body = client.order_body()
+    declined = client.request("POST", "/api/order", auth=True, json=dict(body, prime="fail-declined"))
+    if declined.status_code != 202:
+        return [f"declined order answered {declined.status_code}"]
+    number = declined.json()["data"]["number"]
+    deadline = time.monotonic() + timeout
+    status = "Pending"
+    while status == "Pending" and time.monotonic() < deadline:
+        time.sleep(0.05)
+        status = client.request("GET", f"/api/order/{number}", auth=True).json()["data"]["status"]
+    if status != "failed":
+        return [f"declined order ended {status}"]
+    statuses = [client.request("POST", "/api/order", auth=True, json=body).status_code for _ in range(2)]
+    return [] if statuses == [202, 400] else [f"retries answered {statuses}"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--rtt-ms", type=float, default=2, help="simulated database round trip per statement")
+    parser.add_argument("--pool-size", type=int, default=32)
+    args = parser.parse_args()
+
+    _, pay_url = fake_tappay.start(latency=0)
+    os.environ["TAPPAY_URL"] = pay_url
+    path = standin.create_database(os.path.join(tempfile.mkdtemp(), "concurrency.sqlite3"))
+    counter = standin.QueryCounter()
+    standin.install(path, counter, rtt=args.rtt_ms / 1000, pool_size=args.pool_size)
+
+    from werkzeug.serving import make_server
+    import app as app_module
+
+    logging.getLogger().setLevel(logging.CRITICAL)
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    server = make_server("127.0.0.1", 0, app_module.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    client = Client(f"http://127.0.0.1:{server.server_port}", 0, deep_page=0)
+    db = sqlite3.connect(path, isolation_level=None)
+    member_id = db.execute("SELECT id FROM membership WHERE email = ?", ("bench0@example.com",)).fetchone()[0]
+
+    report = {}
+    for name, run_round in (
+        ("booking", lambda n: booking_round(client, db, member_id, args.concurrency, n)),
+        ("order", lambda n: order_round(client, db, args.concurrency, n)),
+    ):
+        failed_rounds = {}
+        seconds = 0.0
+        counter.reset()
+        for round_number in range(args.rounds):
+            failures, elapsed = run_round(round_number)
+            seconds += elapsed
+            if failures:
+                failed_rounds[round_number] = failures
+        requests_sent = args.rounds * args.concurrency
+        report[name] = {
+            "requests": requests_sent,
+            "failed_rounds": failed_rounds,
+            "throughput_rps": round(requests_sent / seconds, 1),
+            "db_round_trips_per_request": round(counter.reset() / requests_sent, 2),
+        }
+    report["retry_after_decline"] = {"failures": retry_after_decline(client)}
+    server.shutdown()
+
+    print(json.dumps(report, indent=2))
+    failed = any(result["failed_rounds"] for name, result in report.items() if name != "retry_after_decline")
+    return 1 if failed or report["retry_after_decline"]["failures"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,121 @@
+"""Fail when a query on the request path would scan a whole table.
+
+Drives every benchmark scenario once against the SQLite stand-in (built from app/migrations),
+records each distinct statement the app sends, and EXPLAINs it. A statement with a WHERE
+clause whose plan scans a table instead of searching an index is reported and the script
+exits 1. Statements without a WHERE clause (the per-worker catalogue load) read every row on
+purpose and are only listed.
+
+    python benchmarks/explain_check.py           # plans from the stand-in
+    python benchmarks/explain_check.py --mysql   # same statements, EXPLAINed on the MySQL in app/.env
+"""
+import os
+import re
+import sys
+import json
+import logging
+import argparse
+import tempfile
+import threading
+
+import standin
+import fake_tappay
+
+WHERE = re.compile(r"\bWHERE\b", re.IGNORECASE)
+SQLITE_SCAN = re.compile(r"^SCAN (?!CONSTANT ROW)(\w+)")
+
+
+class StatementLog(standin.QueryCounter):
+    """Counter that also keeps the first arguments seen for every distinct statement."""
+
+    def __init__(self):
+        super().__init__()
+        self.statements = {}
+
+    def add(self, query=None, args=None):
+        super().add()
+        if query is not None:
+            with self._lock:
+                self.statements.setdefault(query, tuple(args or ()))
+
+
+def record_statements():
+    """Run each scenario once in-process; returns {query: args}."""
+    import run
+
+    _, pay_url = fake_tappay.start(latency=0)
+    os.environ["TAPPAY_URL"] = pay_url
+    path = standin.create_database(os.path.join(tempfile.mkdtemp(), "explain.sqlite3"))
+    log = StatementLog()
+    standin.install(path, log)
+
+    from werkzeug.serving import make_server
+    import app as app_module
+    import payments
+
+    logging.getLogger().setLevel(logging.WARNING)
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    server = make_server("127.0.0.1", 0, app_module.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    client = run.Client(f"http://127.0.0.1:{server.server_port}", 0, deep_page=4)
+    for name, action in run.SCENARIOS.items():
+        run.SETUP.get(name, lambda c: None)(client)
+        action(client)
+    # Orders record their payment outcome from a background job
+    payments._resources()[0].shutdown(wait=True)
+    server.shutdown()
+    return path, log.statements
+
+
+def sqlite_scans(path, query, args):
+    con = standin.sqlite3.connect(path)
+    try:
+        plan = con.execute("EXPLAIN QUERY PLAN " + standin.translate(query), args).fetchall()
+    finally:
+        con.close()
+    return [match.group(1) for _, _, _, detail in plan for match in [SQLITE_SCAN.match(detail)] if match]
+
+
+def mysql_scans(con, query, args):
+    with con.cursor() as cursor:
+        cursor.execute("EXPLAIN " + query, args)
+        columns = [column[0] for column in cursor.description]
+        rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+    return [row["table"] for row in rows if row.get("type") == "ALL"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mysql", action="store_true", help="EXPLAIN on the MySQL database configured in app/.env")
+    args = parser.parse_args()
+
+    path, statements = record_statements()
+    if args.mysql:
+        from dotenv import load_dotenv
+        from database import connect
+
+        load_dotenv(os.path.join(standin.APP_DIR, ".env"))
+        con = connect()
+        scans = lambda query, query_args: mysql_scans(con, query, query_args)  # noqa: E731
+    else:
+        scans = lambda query, query_args: sqlite_scans(path, query, query_args)  # noqa: E731
+
+    report = {"checked": [], "full_reads": [], "full_scans": []}
+    for query, query_args in sorted(statements.items()):
+        if query.lstrip().upper().startswith("INSERT"):
+            continue
+        tables = scans(query, query_args)
+        if not WHERE.search(query):
+            report["full_reads"].append(query)
+        elif tables:
+            report["full_scans"].append({"query": query, "tables": tables})
+        else:
+            report["checked"].append(query)
+
+    print(json.dumps(report, indent=2))
+    return 1 if report["full_scans"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,94 @@
+"""Local stand-in for the third-party hosts in attractionImages, for offline image proxy tests.
+
+    python benchmarks/fake_origin.py --port 8901 --latency-ms 150
+
+GET /<anything>.jpg answers a photo-sized JPEG (made with Pillow, or the largest image under
+app/static/images without it), the same bytes for the same path. Every request is counted
+per path so tests can check that each original is fetched once.
+"""
+import io
+import os
+import time
+import zlib
+import argparse
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+STATIC_IMAGES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app", "static", "images")
+
+
+def make_image(path, width=1600, height=1067):
+    """Deterministic photo-sized image for `path`."""
+    if Image is None:
+        names = sorted(os.listdir(STATIC_IMAGES), key=lambda name: os.path.getsize(os.path.join(STATIC_IMAGES, name)))
+        with open(os.path.join(STATIC_IMAGES, names[-1]), "rb") as file:
+            return file.read(), "image/png"
+    # Noise over a gradient compresses about as badly as a real photo
+    seed = zlib.crc32(path.encode("utf-8"))
+    noise = Image.effect_noise((width, height), 24 + seed % 16)
+    gradient = Image.linear_gradient("L").rotate(seed % 360).resize((width, height))
+    image = Image.merge("RGB", (noise, gradient, Image.blend(noise, gradient, 0.5)))
+    output = io.BytesIO()
+    image.save(output, format="JPEG", quality=92)
+    return output.getvalue(), "image/jpeg"
+
+
+class FakeOriginHandler(BaseHTTPRequestHandler):
+    latency = 0.0
+    hits = Counter()
+    _lock = threading.Lock()
+    _images = {}
+
+    def do_GET(self):
+        with self._lock:
+            FakeOriginHandler.hits[self.path] += 1
+            cached = self._images.get(self.path)
+        if self.latency:
+            time.sleep(self.latency)
+        if not self.path.endswith((".jpg", ".png")):
+            self.send_error(404)
+            return
+        if cached is None:
+            cached = make_image(self.path)
+            with self._lock:
+                self._images[self.path] = cached
+        body, content_type = cached
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start(port=0, latency=0.0):
+    """Start the fake origin in a daemon thread; returns (server, base_url)."""
+    FakeOriginHandler.latency = latency
+    server = ThreadingHTTPServer(("127.0.0.1", port), FakeOriginHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8901)
+    parser.add_argument("--latency-ms", type=float, default=0)
+    args = parser.parse_args()
+
+    FakeOriginHandler.latency = args.latency_ms / 1000
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), FakeOriginHandler)
+    print(f"Fake image origin listening on http://127.0.0.1:{args.port}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""Local stand-in for TapPay's pay-by-prime endpoint, for offline and load testing.
+
+    python benchmarks/fake_tappay.py --port 8900 --latency-ms 800
+    TAPPAY_URL=http://127.0.0.1:8900/tpc/payment/pay-by-prime gunicorn ... app:app
+
+Any prime starting with "fail" is declined; everything else succeeds after the latency.
+A prime starting with "drop" is charged, but the connection is closed without a reply.
+Payments sent with an order_number can be looked up again through the record query endpoint,
+TAPPAY_RECORD_URL=http://127.0.0.1:8900/tpc/transaction/query.
+"""
+import json
+import time
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PAY_PATH = "/tpc/payment/pay-by-prime"
+RECORD_PATH = "/tpc/transaction/query"
+# TapPay trade record statuses
+RECORD_OK = 1
+RECORD_ERROR = -1
+
+
+class FakeTapPayHandler(BaseHTTPRequestHandler):
+    latency = 0.0
+    calls = 0
+    records = {}
+    _calls_lock = threading.Lock()
+
+    def do_POST(self):
+        if self.path not in (PAY_PATH, RECORD_PATH):
+            self.send_error(404)
+            return
+
+        length = int(self.headers.get("Content-Length", 0))
+        payload = json.loads(self.rfile.read(length) or b"{}")
+        if self.path == RECORD_PATH:
+            self.reply(self.query_records(payload))
+            return
+        with self._calls_lock:
+            FakeTapPayHandler.calls += 1
+        time.sleep(self.latency)
+
+        declined = str(payload.get("prime", "")).startswith("fail")
+        if payload.get("order_number"):
+            self.records[str(payload["order_number"])] = RECORD_ERROR if declined else RECORD_OK
+        if str(payload.get("prime", "")).startswith("drop"):
+            # Charged, then the reply is lost on the way back
+            self.close_connection = True
+            return
+        if declined:
+            reply = {"status": 10003, "msg": "Card declined"}
+        else:
+            reply = {
+                "status": 0,
+                "msg": "Success",
+                "amount": payload.get("amount"),
+                "rec_trade_id": f"FAKE{int(time.time() * 1000)}",
+            }
+        self.reply(reply)
+
+    def query_records(self, payload):
+        order_number = str(payload.get("filters", {}).get("order_number", ""))
+        if order_number not in self.records:
+            return {"status": 2, "msg": "No records", "trade_records": []}
+        return {"status": 0, "msg": "Success", "trade_records": [
+            {"order_number": order_number, "record_status": self.records[order_number]},
+        ]}
+
+    def reply(self, reply):
+        body = json.dumps(reply).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start(port=0, latency=0.0):
+    """Start the fake gateway in a daemon thread; returns (server, pay_url)."""
+    FakeTapPayHandler.latency = latency
+    server = ThreadingHTTPServer(("127.0.0.1", port), FakeTapPayHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}{PAY_PATH}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency-ms", type=float, default=500)
+    args = parser.parse_args()
+
+    FakeTapPayHandler.latency = args.latency_ms / 1000
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), FakeTapPayHandler)
+    print(f"Fake TapPay listening on http://127.0.0.1:{args.port}{PAY_PATH}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Generate order numbers from many processes at once and check that none repeat.
+
+Each process imports app/order_ids.py fresh (spawn, like a gunicorn worker booting), claims
+its slot and calls next_order_number() as fast as it can. The parent checks that every
+process's numbers strictly increase and that no number appears twice across all of them.
+
+    python benchmarks/order_id_stress.py --processes 4 --ids 1000000
+"""
+import os
+import sys
+import json
+import time
+import array
+import argparse
+import tempfile
+import multiprocessing
+
+import standin  # noqa: F401  (puts app/ on sys.path)
+
+
+def generate(count, lock_dir, output):
+    os.environ["ORDER_ID_LOCK_DIR"] = lock_dir
+    import order_ids
+
+    next_order_number = order_ids.next_order_number
+    ids = array.array("Q")
+    started = time.perf_counter()
+    for _ in range(count):
+        ids.append(int(next_order_number()))
+    seconds = time.perf_counter() - started
+    with open(output, "wb") as file:
+        ids.tofile(file)
+    return {"worker": order_ids.get_generator().worker, "ids_per_sec": round(count / seconds)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--ids", type=int, default=1_000_000, help="ids per process")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp()
+    lock_dir = os.path.join(work_dir, "locks")
+    outputs = [os.path.join(work_dir, f"ids-{i}.bin") for i in range(args.processes)]
+    with multiprocessing.get_context("spawn").Pool(args.processes) as pool:
+        workers = pool.starmap(generate, [(args.ids, lock_dir, output) for output in outputs])
+
+    seen = set()
+    not_increasing = 0
+    for output in outputs:
+        ids = array.array("Q")
+        with open(output, "rb") as file:
+            ids.frombytes(file.read())
+        not_increasing += sum(1 for a, b in zip(ids, ids[1:]) if b <= a)
+        seen.update(ids)
+    total = args.processes * args.ids
+
+    report = {
+        "processes": workers,
+        "total_ids": total,
+        "duplicates": total - len(seen),
+        "not_increasing": not_increasing,
+        "max_digits": len(str(max(seen))),
+    }
+    print(json.dumps(report, indent=2))
+    return 1 if report["duplicates"] or report["not_increasing"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,88 @@
+"""Check that orders left Pending by a lost payment job get settled from the gateway's records.
+
+Payment jobs live in their worker's thread pool, so a worker that is recycled or killed takes
+its queued and running jobs with it. This writes Pending orders straight into the
+stand-in, as if their jobs had died, then starts the app with a short reconcile interval:
+- charged: the fake gateway charged the card before the job was lost -> confirm
+- dropped: the job ran, but the gateway's reply was lost after the charge. The job must
+  leave the order Pending rather than fail it, and the sweep confirms it
+- declined: the gateway declined it -> failed, and the trip is released
+- lost: the job never reached the gateway -> failed, and the trip is released
+- fresh: placed just now, so its job may still be running -> left Pending
+
+    python benchmarks/payment_recovery_check.py
+"""
+import os
+import sys
+import json
+import time
+import sqlite3
+import logging
+import argparse
+import tempfile
+
+import standin
+import fake_tappay
+
+EXPECTED = {
+    "charged": ("confirm", 1),
+    "dropped": ("confirm", 1),
+    "declined": ("failed", None),
+    "lost": ("failed", None),
+    "fresh": ("Pending", 1),
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--timeout", type=float, default=10, help="seconds to wait for the sweep")
+    args = parser.parse_args()
+
+    _, pay_url = fake_tappay.start(latency=0)
+    os.environ["TAPPAY_URL"] = pay_url
+    os.environ["TAPPAY_RECORD_URL"] = pay_url.replace(fake_tappay.PAY_PATH, fake_tappay.RECORD_PATH)
+    os.environ["PAYMENT_RECONCILE_INTERVAL"] = "0.2"
+    os.environ["PAYMENT_STALE_AFTER"] = "60"
+    path = standin.create_database(os.path.join(tempfile.mkdtemp(), "recovery.sqlite3"))
+    standin.install(path, standin.QueryCounter())
+
+    import payments
+    from order_ids import OrderIdGenerator
+
+    an_hour_ago = OrderIdGenerator(0, 62, clock=lambda: time.time() - 3600)
+    now = OrderIdGenerator(0, 63)
+    numbers = {name: str((now if name == "fresh" else an_hour_ago).next_id()) for name in EXPECTED}
+    payments.pay_by_prime(numbers["charged"], "bench", 2000, "charged", "bench@example.com", "0912345678")
+    payments.pay_by_prime(numbers["declined"], "fail-declined", 2000, "declined", "bench@example.com", "0912345678")
+
+    db = sqlite3.connect(path, isolation_level=None)
+    for attraction_id, (name, number) in enumerate(numbers.items(), start=1):
+        db.execute(
+            "INSERT INTO ordersystem (orderNum, memberId, attractionId, date, time, price, email, name, phone, status) "
+            "VALUES (?, 1, ?, '2030-01-01', 'morning', 2000, 'bench@example.com', ?, '0912345678', 'Pending')",
+            (number, attraction_id, name),
+        )
+
+    logging.getLogger().setLevel(logging.CRITICAL)
+    dropped_outcome = payments.process_payment(numbers["dropped"], "drop-reply", 2000, "dropped", "bench@example.com", "0912345678")
+
+    import app  # noqa: F401  (starts the reconciler)
+
+    deadline = time.monotonic() + args.timeout
+    while True:
+        results = {
+            name: db.execute("SELECT status, tripActive FROM ordersystem WHERE orderNum = ?", (number,)).fetchone()
+            for name, number in numbers.items()
+        }
+        if results == EXPECTED or time.monotonic() > deadline:
+            break
+        time.sleep(0.1)
+
+    report = {name: {"status": status, "tripActive": active, "expected": EXPECTED[name][0]} for name, (status, active) in results.items()}
+    report["dropped"]["job_outcome"] = dropped_outcome
+    print(json.dumps(report, indent=2))
+    return 0 if results == EXPECTED and dropped_outcome == "Pending" else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
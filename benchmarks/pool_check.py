@@ -0,0 +1,99 @@
+"""Check that a connection closed twice cannot hurt the request that checked it out next.
+
+Views close their connection, and release_db_connection closes it again on teardown. In
+between, the pool may hand the same connection to another request. This replays that order
+on a one-connection pool, both on the pool directly and as two Flask requests on two threads:
+
+    request A: acquire, close
+    request B: acquire (the same connection), write without committing
+    request A: close again (teardown)
+
+B's write must still be in its open transaction, the pool must still count the connection
+as in use, and a third checkout must time out instead of getting B's connection.
+
+    python benchmarks/pool_check.py
+"""
+import os
+import sys
+import json
+import tempfile
+import threading
+
+from flask import Flask
+
+import standin
+
+INSERT_BOOKING = "INSERT INTO booking (memberID, attractionID, date, time, price) VALUES (%s, 1, '2030-01-01', 'morning', 2000)"
+
+
+def check_pool(pool, member_id):
+    first = pool.acquire()
+    first.close()
+    second = pool.acquire()
+    second.cursor().execute(INSERT_BOOKING, (member_id,))
+    first.close()
+    return settle(pool, second, member_id)
+
+
+def check_teardown(pool, member_id):
+    import database
+
+    app = Flask(__name__)
+    database.init_app(app)
+    closed = threading.Event()
+    torn_down = threading.Event()
+
+    def request_a():
+        with app.app_context():
+            database.get_db_connection().close()
+            closed.set()
+            torn_down.wait()
+        # Leaving the context ran release_db_connection
+
+    thread = threading.Thread(target=request_a)
+    thread.start()
+    closed.wait()
+    with app.app_context():
+        second = database.get_db_connection()
+        second.cursor().execute(INSERT_BOOKING, (member_id,))
+        torn_down.set()
+        thread.join()
+        return settle(pool, second, member_id)
+
+
+def settle(pool, holder, member_id):
+    """What `holder` still sees of its uncommitted write, and what the pool thinks of it."""
+    cursor = holder.cursor()
+    cursor.execute("SELECT COUNT(*) FROM booking WHERE memberID = %s", (member_id,))
+    rows = cursor.fetchone()[0]
+    stats = pool.stats()
+    try:
+        pool.acquire().close()
+        third = "got a connection"
+    except Exception as e:
+        third = type(e).__name__
+    holder.close()
+    return {
+        "uncommitted_rows_seen": rows,
+        "in_use": stats["in_use"],
+        "idle": stats["idle"],
+        "third_checkout": third,
+        "ok": rows == 1 and stats["in_use"] == 1 and stats["idle"] == 0 and third == "PoolTimeout",
+    }
+
+
+def main():
+    path = standin.create_database(os.path.join(tempfile.mkdtemp(), "pool.sqlite3"))
+    pool = standin.install(path, standin.QueryCounter(), pool_size=1)
+    pool.checkout_timeout = 0.2
+
+    results = {
+        "pool": check_pool(pool, 900001),
+        "teardown": check_teardown(pool, 900002),
+    }
+    print(json.dumps(results, indent=2))
+    return 0 if all(result["ok"] for result in results.values()) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
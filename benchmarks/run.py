@@ -0,0 +1,245 @@
+"""Latency and throughput benchmark for every API route.
+
+Boots app.app in-process behind a threaded WSGI server, backed by the SQLite stand-in seeded
+from app/data/taipei-attractions.json and a local fake TapPay gateway, then drives each
+scenario from concurrent clients and reports throughput, p50/p95/p99 latency and database
+round trips per request.
+
+    python benchmarks/run.py --concurrency 8 --requests 400 --output results/$(git rev-parse --short HEAD).json
+    python benchmarks/run.py --compare results/old.json --output results/new.json
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import logging
+import tempfile
+import threading
+import subprocess
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+import standin
+import fake_tappay
+
+PAGE_SIZE = 12
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class Client:
+    """One simulated user with its own HTTP session and login."""
+
+    def __init__(self, base_url, index, deep_page):
+        self.base_url = base_url
+        self.deep_page = deep_page
+        self.session = requests.Session()
+        self.index = index
+        email = f"bench{index}@example.com"
+        self.session.post(f"{base_url}/api/user", data={"signupName": f"bench{index}", "signupEmail": email, "signupPassword": "bench"})
+        reply = self.session.put(f"{base_url}/api/user/auth", data={"signinEmail": email, "signinPassword": "bench"})
+        self.headers = {"Authorization": f"Bearer {reply.json()['token']}"}
+        self.sequence = 0
+        self.order_number = None
+
+    def request(self, method, path, auth=False, **kwargs):
+        headers = self.headers if auth else None
+        return self.session.request(method, f"{self.base_url}{path}", headers=headers, **kwargs)
+
+    def next_sequence(self):
+        self.sequence += 1
+        return self.sequence
+
+    def order_body(self):
+        # Vary the contact name so the duplicate-order check never rejects a benchmark order
+        sequence = self.next_sequence()
+        return {
+            "prime": "bench",
+            "order": {
+                "price": [2000],
+                "trip": {"attraction": {"id": [1 + sequence % 58]}, "date": ["2030-01-01"], "time": ["morning"]},
+                "contact": {"name": f"bench{self.index}-{sequence}", "email": "bench@example.com", "phone": "0912345678"},
+            },
+        }
+
+
+def booking_body(client):
+    return {"attractionId": 1 + client.index % 58, "date": "2030-01-01", "time": "morning", "price": 2000}
+
+
+def batch_ids(client):
+    start = client.next_sequence()
+    return ",".join(str(1 + (start + i) % 58) for i in range(PAGE_SIZE))
+
+
+def page_load(client, page, *api_calls):
+    """A page and the API calls its script makes on load; answers the worst response."""
+    responses = [client.request("GET", page)]
+    responses.extend(client.request("GET", path, auth=True) for path in api_calls)
+    return max(responses, key=lambda response: response.status_code)
+
+
+def place_order(client):
+    client.order_number = client.request("POST", "/api/order", auth=True, json=client.order_body()).json()["data"]["number"]
+
+
+SCENARIOS = {
+    "attractions_first_page": lambda c: c.request("GET", "/api/attractions?page=0"),
+    "attractions_deep_page": lambda c: c.request("GET", f"/api/attractions?page={c.deep_page}"),
+    "attractions_cursor": lambda c: c.request("GET", "/api/attractions?cursor="),
+    "attractions_keyword": lambda c: c.request("GET", "/api/attractions?keyword=Temple&page=0"),
+    "attractions_keyword_mrt": lambda c: c.request("GET", "/api/attractions?keyword=Xinbeitou&page=0"),
+    "attraction_by_id": lambda c: c.request("GET", f"/api/attraction/{1 + c.next_sequence() % 58}"),
+    "attractions_batch": lambda c: c.request("GET", f"/api/attractions/batch?ids={batch_ids(c)}"),
+    "attractions_nearby": lambda c: c.request("GET", f"/api/attractions/nearby?id={1 + c.next_sequence() % 58}&radius=3000"),
+    "mrts": lambda c: c.request("GET", "/api/mrts"),
+    "user_auth": lambda c: c.request("GET", "/api/user/auth", auth=True),
+    "booking_create": lambda c: c.request("POST", "/api/booking", auth=True, json=booking_body(c)),
+    "booking_read": lambda c: c.request("GET", "/api/booking", auth=True),
+    "booking_delete": lambda c: c.request("DELETE", "/api/booking", auth=True),
+    "order_create": lambda c: c.request("POST", "/api/order", auth=True, json=c.order_body()),
+    "booking_page": lambda c: page_load(c, "/booking", "/api/user/auth", "/api/booking"),
+    "thankyou_page": lambda c: page_load(c, f"/thankyou?number={c.order_number}", "/api/user/auth", f"/api/order/{c.order_number}"),
+}
+
+# Run for every client before a scenario is timed
+SETUP = {
+    "booking_page": lambda c: c.request("POST", "/api/booking", auth=True, json=booking_body(c)),
+    "thankyou_page": place_order,
+}
+
+
+def run_scenario(name, clients, counter, total_requests):
+    action = SCENARIOS[name]
+    for client in clients:
+        SETUP.get(name, lambda c: None)(client)
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+    per_client = max(1, total_requests // len(clients))
+
+    def drive(client):
+        nonlocal errors
+        local = []
+        local_errors = 0
+        for _ in range(per_client):
+            start = time.perf_counter()
+            response = action(client)
+            local.append((time.perf_counter() - start) * 1000)
+            if response.status_code >= 400:
+                local_errors += 1
+        with lock:
+            latencies.extend(local)
+            errors += local_errors
+
+    if counter is not None:
+        counter.reset()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(clients)) as executor:
+        list(executor.map(drive, clients))
+    elapsed = time.perf_counter() - started
+    # A server in another process keeps its own counter, so round trips are unknown there
+    queries = counter.reset() if counter is not None else None
+
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50), 3),
+        "p95_ms": round(percentile(latencies, 95), 3),
+        "p99_ms": round(percentile(latencies, 99), 3),
+        "mean_ms": round(statistics.mean(latencies), 3),
+        "db_round_trips_per_request": round(queries / len(latencies), 2) if queries is not None else None,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=standin.ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(previous, current):
+    print(f"\n{'scenario':<26}{'p50 ms':>18}{'p99 ms':>18}{'rps':>18}")
+    for name, result in current["scenarios"].items():
+        old = previous.get("scenarios", {}).get(name)
+        if not old:
+            continue
+        cells = []
+        for key in ("p50_ms", "p99_ms", "throughput_rps"):
+            change = (result[key] - old[key]) / old[key] * 100 if old[key] else 0
+            cells.append(f"{old[key]:>7} -> {result[key]:<7}({change:+.0f}%)")
+        print(f"{name:<26}" + "".join(f"{cell:>18}" for cell in cells))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=400, help="requests per scenario")
+    parser.add_argument("--scale", type=int, default=1, help="repeat the 58-row catalogue this many times")
+    parser.add_argument("--rtt-ms", type=float, default=0.5, help="simulated database round trip per statement")
+    parser.add_argument("--payment-latency-ms", type=float, default=300)
+    parser.add_argument("--pool-size", type=int, default=5)
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS), help="run only these scenarios")
+    parser.add_argument("--output", help="write the results as JSON to this path")
+    parser.add_argument("--compare", help="previous results JSON to compare against")
+    args = parser.parse_args()
+
+    _, pay_url = fake_tappay.start(latency=args.payment_latency_ms / 1000)
+    os.environ["TAPPAY_URL"] = pay_url
+
+    path = standin.create_database(os.path.join(tempfile.mkdtemp(), "bench.sqlite3"), scale=args.scale)
+    counter = standin.QueryCounter()
+    standin.install(path, counter, rtt=args.rtt_ms / 1000, pool_size=args.pool_size)
+
+    from werkzeug.serving import make_server
+    import app as app_module
+
+    # Per-request access and pool logs would dominate the timings
+    logging.getLogger().setLevel(logging.WARNING)
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+
+    server = make_server("127.0.0.1", 0, app_module.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+
+    deep_page = (58 * args.scale - 1) // 12
+    clients = [Client(base_url, index, deep_page) for index in range(args.concurrency)]
+
+    # Warm the per-worker caches so the first scenario does not pay for them
+    clients[0].request("GET", "/api/attractions?page=0")
+
+    results = {}
+    for name in args.scenario or list(SCENARIOS):
+        results[name] = run_scenario(name, clients, counter, args.requests)
+        print(f"{name:<26} {json.dumps(results[name])}", file=sys.stderr)
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": vars(args),
+        "scenarios": results,
+    }
+    server.shutdown()
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2)
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as file:
+            compare(json.load(file), report)
+    if not args.output and not args.compare:
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
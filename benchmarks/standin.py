@@ -0,0 +1,229 @@
+"""SQLite stand-in for the MySQL database, seeded from app/data/taipei-attractions.json.
+
+The connection mimics the small part of the pymysql API the app uses (cursor, execute with
+%s placeholders, fetchone/fetchall, commit, rollback, ping, close) and counts every
+statement it runs so benchmarks can report database round trips per request. Tables and
+indexes come from the checked-in migrations in app/migrations.
+"""
+import os
+import re
+import sys
+import json
+import time
+import sqlite3
+import threading
+
+import pymysql
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_DIR = os.path.join(ROOT, "app")
+DATA_FILE = os.path.join(APP_DIR, "data", "taipei-attractions.json")
+LOCK_TIMEOUT = 30
+
+if APP_DIR not in sys.path:
+    sys.path.insert(0, APP_DIR)
+
+# Load generators send everything from one address; admission_check.py turns this back on
+os.environ.setdefault("ADMISSION_CONTROL", "off")
+# Benchmarks count every statement; payment_recovery_check.py runs the sweep itself
+os.environ.setdefault("PAYMENT_RECONCILE_INTERVAL", "0")
+
+from ingest import split_images  # noqa: E402
+from migrate import load_migrations, split_statements  # noqa: E402
+
+MYSQL_DDL = (
+    (re.compile(r"INT NOT NULL AUTO_INCREMENT PRIMARY KEY"), "INTEGER PRIMARY KEY AUTOINCREMENT"),
+    (re.compile(r"\)\s*ENGINE=.*$", re.DOTALL), ")"),
+    (re.compile(r"^ALTER TABLE (\w+) ADD UNIQUE KEY (\w+) (\(.*\))$", re.DOTALL), r"CREATE UNIQUE INDEX \2 ON \1 \3"),
+    (re.compile(r"^ALTER TABLE (\w+) ADD INDEX (\w+) (\(.*\))$", re.DOTALL), r"CREATE INDEX \2 ON \1 \3"),
+    (re.compile(r"^ALTER TABLE \w+ DROP INDEX (\w+)$"), r"DROP INDEX \1"),
+)
+UNIQUE_FAILED = re.compile(r"UNIQUE constraint failed: (\w+)\.")
+
+
+class QueryCounter:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.count = 0
+
+    def add(self, query=None, args=None):
+        with self._lock:
+            self.count += 1
+
+    def reset(self):
+        with self._lock:
+            count, self.count = self.count, 0
+        return count
+
+
+def retry_while_locked(call, *args):
+    # SQLite's own busy timeout sleeps inside C, which would stall every greenlet of an
+    # eventlet worker while the lock holder is one of them; wait with time.sleep instead
+    deadline = time.monotonic() + LOCK_TIMEOUT
+    while True:
+        try:
+            return call(*args)
+        except sqlite3.OperationalError as e:
+            if "locked" not in str(e) or time.monotonic() > deadline:
+                raise
+            time.sleep(0.001)
+
+
+class StandInCursor:
+    def __init__(self, connection):
+        self._connection = connection
+        self._cursor = connection._con.cursor()
+
+    def execute(self, query, args=None):
+        self._connection.counter.add(query, args)
+        if self._connection.rtt:
+            time.sleep(self._connection.rtt)
+        self._connection.begin(query)
+        try:
+            retry_while_locked(self._cursor.execute, translate(query), tuple(args or ()))
+        except sqlite3.IntegrityError as e:
+            raise self._connection.duplicate_entry(e) from e
+        return self._cursor.rowcount
+
+    def executemany(self, query, seq_of_args):
+        seq_of_args = list(seq_of_args)
+        self._connection.counter.add(query, seq_of_args[0] if seq_of_args else None)
+        if self._connection.rtt:
+            time.sleep(self._connection.rtt)
+        self._connection.begin(query)
+        try:
+            retry_while_locked(self._cursor.executemany, translate(query), [tuple(args) for args in seq_of_args])
+        except sqlite3.IntegrityError as e:
+            raise self._connection.duplicate_entry(e) from e
+        return self._cursor.rowcount
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchall(self):
+        return tuple(self._cursor.fetchall())
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    def close(self):
+        self._cursor.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class StandInConnection:
+    def __init__(self, path, counter, rtt=0.0):
+        self._con = sqlite3.connect(path, check_same_thread=False, timeout=0, isolation_level=None)
+        self.counter = counter
+        self.rtt = rtt
+
+    def begin(self, query):
+        # Take the write lock with the first write, like MySQL's row locks, so a waiting writer
+        # never holds a stale read snapshot that could not be upgraded later
+        if not self._con.in_transaction and not query.lstrip().upper().startswith("SELECT"):
+            retry_while_locked(self._con.execute, "BEGIN IMMEDIATE")
+
+    def cursor(self):
+        return StandInCursor(self)
+
+    def duplicate_entry(self, error):
+        """SQLite's unique violation as the pymysql error MySQL would raise, naming the key it hit."""
+        match = UNIQUE_FAILED.match(str(error))
+        if not match:
+            return pymysql.err.IntegrityError(0, str(error))
+        table = match.group(1)
+        columns = [column.split(".", 1)[1] for column in str(error).split(": ", 1)[1].split(", ")]
+        key = "PRIMARY"
+        for _, name, unique, *_ in self._con.execute(f"PRAGMA index_list({table})").fetchall():
+            indexed = [row[2] for row in self._con.execute(f"PRAGMA index_info({name})").fetchall()]
+            if unique and indexed == columns:
+                key = name
+        return pymysql.err.IntegrityError(1062, f"Duplicate entry for key '{table}.{key}'")
+
+    def commit(self):
+        retry_while_locked(self._con.commit)
+
+    def rollback(self):
+        self._con.rollback()
+
+    def ping(self, reconnect=False):
+        pass
+
+    def close(self):
+        self._con.close()
+
+
+def translate(query):
+    """Rewrite the MySQL dialect used by the app into SQLite."""
+    query = re.sub(r"%s", "?", query)
+    if "ON DUPLICATE KEY UPDATE" in query:
+        query = query.replace("ON DUPLICATE KEY UPDATE", "ON CONFLICT DO UPDATE SET")
+        query = re.sub(r"VALUES\((\w+)\)", r"excluded.\1", query)
+    return query
+
+
+def schema_statements():
+    """The checked-in migrations, rewritten for SQLite, so the stand-in has the production indexes."""
+    statements = []
+    for _, _, migration in load_migrations():
+        with open(migration, "r", encoding="utf-8") as file:
+            for statement in split_statements(file.read()):
+                for pattern, replacement in MYSQL_DDL:
+                    statement = pattern.sub(replacement, statement)
+                statements.append(statement)
+    return statements
+
+
+def create_database(path, scale=1):
+    """Create and seed a stand-in database; scale > 1 repeats the catalogue with new rownumbers."""
+    for stale in (path, f"{path}-wal", f"{path}-shm"):
+        if os.path.exists(stale):
+            os.remove(stale)
+    with open(DATA_FILE, "r", encoding="utf-8") as file:
+        results = json.load(file)["result"]["results"]
+
+    con = sqlite3.connect(path)
+    # WAL lets readers in other worker processes carry on while one of them writes
+    con.execute("PRAGMA journal_mode=WAL")
+    for statement in schema_statements():
+        con.execute(statement)
+    rownumber = 0
+    for _ in range(scale):
+        for result in results:
+            rownumber += 1
+            con.execute(
+                "INSERT INTO attractions (rownumber, name, category, description, address, transport, mrt, latitude, longitude) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (rownumber, result["name"], result["CAT"], result["description"], result["address"],
+                 result["direction"], result["MRT"], float(result["latitude"]), float(result["longitude"])),
+            )
+            con.executemany(
+                "INSERT INTO attractionImages (attractionRownumber, imageUrl) VALUES (?, ?)",
+                [(rownumber, url) for url in split_images(result["file"])],
+            )
+    con.commit()
+    con.close()
+    return path
+
+
+def connection_factory(path, counter, rtt=0.0):
+    return lambda: StandInConnection(path, counter, rtt)
+
+
+def install(path, counter, rtt=0.0, pool_size=5):
+    """Point the app's per-process connection pool at the stand-in database."""
+    import database
+
+    pool = database.ConnectionPool(connection_factory(path, counter, rtt), max_size=pool_size)
+    database.get_pool.set(pool)
+    return pool
@@ -0,0 +1,19 @@
+"""WSGI entry point serving app.app from the SQLite stand-in, for benchmarking under gunicorn.
+
+    STANDIN_DB=/tmp/bench.sqlite3 gunicorn -c app/gunicorn.conf.py --chdir benchmarks standin_app:app
+
+Gunicorn imports this module in every worker after the fork (and after a green worker has
+monkey-patched), so each worker points its own connection pool at the stand-in.
+"""
+import os
+
+import standin
+
+standin.install(
+    os.environ["STANDIN_DB"],
+    standin.QueryCounter(),
+    rtt=float(os.getenv("STANDIN_RTT_MS", 0.5)) / 1000,
+    pool_size=int(os.getenv("DB_POOL_SIZE", 5)),
+)
+
+from app import app  # noqa: E402,F401
@@ -0,0 +1,144 @@
+"""Compare gunicorn worker classes on the same workload.
+
+Starts gunicorn once per profile with app/gunicorn.conf.py, serving app.app from a fresh
+SQLite stand-in (standin_app.py) with a simulated database round trip and a fake TapPay
+gateway, then drives the run.py scenarios from more concurrent clients than any sync
+profile has workers.
+
+    python benchmarks/worker_profiles.py --concurrency 32 --rtt-ms 2 --output results/workers.json
+    python benchmarks/worker_profiles.py --profile sync --profile eventlet --scenario booking_read
+"""
+import os
+import sys
+import json
+import time
+import socket
+import signal
+import argparse
+import tempfile
+import subprocess
+
+import requests
+
+import standin
+import fake_tappay
+from run import Client, SCENARIOS, run_scenario, git_commit
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+CONFIG_FILE = os.path.join(standin.APP_DIR, "gunicorn.conf.py")
+PROFILES = ("sync", "gthread", "eventlet")
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_ready(base_url, process, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"gunicorn exited with status {process.returncode}")
+        try:
+            if requests.get(f"{base_url}/api/mrts", timeout=5).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError("gunicorn did not become ready in time")
+
+
+def start_server(profile, args, pay_url, log_file):
+    port = free_port()
+    env = dict(
+        os.environ,
+        GUNICORN_WORKER_CLASS=profile,
+        GUNICORN_BIND=f"127.0.0.1:{port}",
+        GUNICORN_LOG_LEVEL="warning",
+        STANDIN_DB=standin.create_database(os.path.join(tempfile.mkdtemp(), "bench.sqlite3"), scale=args.scale),
+        STANDIN_RTT_MS=str(args.rtt_ms),
+        TAPPAY_URL=pay_url,
+        METRICS_DIR=tempfile.mkdtemp(),
+    )
+    if args.workers:
+        env["GUNICORN_WORKERS"] = str(args.workers)
+    process = subprocess.Popen(
+        ["gunicorn", "-c", CONFIG_FILE, "--chdir", BENCH_DIR, "standin_app:app"],
+        env=env, stdout=log_file, stderr=subprocess.STDOUT,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        wait_until_ready(base_url, process)
+    except RuntimeError:
+        process.kill()
+        raise
+    return process, base_url
+
+
+def run_profile(profile, args, pay_url, log_file):
+    process, base_url = start_server(profile, args, pay_url, log_file)
+    try:
+        deep_page = (58 * args.scale - 1) // 12
+        clients = [Client(base_url, index, deep_page) for index in range(args.concurrency)]
+        clients[0].request("GET", "/api/attractions?page=0")
+
+        results = {}
+        for name in args.scenario or list(SCENARIOS):
+            results[name] = run_scenario(name, clients, None, args.requests)
+            print(f"{profile:<10}{name:<26} {json.dumps(results[name])}", file=sys.stderr)
+        return results
+    finally:
+        process.send_signal(signal.SIGTERM)
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def summary(report):
+    profiles = list(report["profiles"])
+    print(f"\n{'scenario':<26}" + "".join(f"{profile + ' p50/p99 ms, rps':>32}" for profile in profiles))
+    for name in next(iter(report["profiles"].values())):
+        cells = []
+        for profile in profiles:
+            result = report["profiles"][profile][name]
+            cells.append(f"{result['p50_ms']:.1f}/{result['p99_ms']:.1f}, {result['throughput_rps']:.0f}")
+        print(f"{name:<26}" + "".join(f"{cell:>32}" for cell in cells))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--profile", action="append", choices=PROFILES, help="worker classes to compare")
+    parser.add_argument("--workers", type=int, help="override the per-profile worker count from gunicorn.conf.py")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=640, help="requests per scenario")
+    parser.add_argument("--scale", type=int, default=1)
+    parser.add_argument("--rtt-ms", type=float, default=2.0, help="simulated database round trip per statement")
+    parser.add_argument("--payment-latency-ms", type=float, default=300)
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS))
+    parser.add_argument("--output", help="write the results as JSON to this path")
+    args = parser.parse_args()
+
+    _, pay_url = fake_tappay.start(latency=args.payment_latency_ms / 1000)
+    report = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "cpu_count": os.cpu_count(),
+        "config": vars(args),
+        "profiles": {},
+    }
+    with tempfile.NamedTemporaryFile("w", prefix="gunicorn-", suffix=".log", delete=False) as log_file:
+        for profile in args.profile or PROFILES:
+            report["profiles"][profile] = run_profile(profile, args, pay_url, log_file)
+    print(f"gunicorn logs: {log_file.name}", file=sys.stderr)
+
+    summary(report)
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,10 @@
 #!/bin/bash
 
-# Start Gunicorn in daemon mode with Eventlet worker, access and error logs, and bind to 0.0.0.0:3000
-gunicorn -w 2 --worker-class sync --log-level info -b 0.0.0.0:3000 app:app &
+# Let nginx send cached images (see the /img-cache/ location in nginx.conf)
+export IMAGE_ACCEL_REDIRECT=/img-cache/
+
+# Start Gunicorn with the profile in app/gunicorn.conf.py (eventlet workers by default, see GUNICORN_* variables)
+gunicorn -c gunicorn.conf.py app:app &
 
 # Start Nginx in foreground mode (no daemon)
 nginx -g 'daemon off;'
\ No newline at end of file